@@ -1 +1,217 @@
 # analysis.py
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import compute_metrics
+from trackio import load_run_metadata, load_track, track_xy
+
+ANALYSIS_CACHE_DIR = os.path.join("outputs", "cache", "analysis")
+
+# Zone metrics are recomputed from the stored trajectories, so changing the center box or
+# the zones never needs the video again. Results are cached per track file, keyed by the
+# analysis parameters, in outputs/cache/analysis/<track>_<sha1 of path, size, mtime>.json.
+
+DEFAULT_PARAMS = {
+    "center_percent": 50,
+    "zones": None,
+    "immobility_speed": 20.0,
+    "min_immobility_seconds": 1.0,
+    "speed_bins": 20,
+}
+
+
+def find_tracks(results_folder):
+    """Track files in a results folder; the .npy track wins when both formats exist."""
+    tracks = {}
+    for name in sorted(os.listdir(results_folder)):
+        base, ext = os.path.splitext(name)
+        if not base.endswith("_tracking") or ext not in (".csv", ".npy"):
+            continue
+        if ext == ".npy" or base not in tracks:
+            tracks[base] = os.path.join(results_folder, name)
+    return list(tracks.values())
+
+
+def track_fingerprint(track_path):
+    """Identity of a track file's current contents (path, size and modification time)."""
+    stat = os.stat(track_path)
+    key = f"{os.path.abspath(track_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def analysis_cache_path(track_path):
+    """Cache file holding every analysis computed for the current version of a track."""
+    name = os.path.splitext(os.path.basename(track_path))[0]
+    return os.path.join(ANALYSIS_CACHE_DIR, f"{name}_{track_fingerprint(track_path)}.json")
+
+
+def params_key(params):
+    """Stable key of a set of analysis parameters."""
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def _load_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_path, cache):
+    os.makedirs(ANALYSIS_CACHE_DIR, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_path)
+
+
+def resolve_params(metadata, center_percent=None, zones=None, **overrides):
+    """
+    Analysis parameters for a track: explicit arguments, then the run metadata, then defaults.
+
+    An explicit center_percent replaces the center zone saved with the run, so a sweep over
+    center sizes keeps the run's other zones.
+    """
+    metadata = metadata or {}
+    params = dict(DEFAULT_PARAMS)
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    if zones is None:
+        zones = metadata.get("zones")
+    if center_percent is None:
+        center_percent = metadata.get("center_percent", DEFAULT_PARAMS["center_percent"])
+    elif zones:
+        zones = [zone for zone in zones if zone["name"] != "center"]
+    params["center_percent"] = center_percent
+    params["zones"] = zones or None
+    return params
+
+
+def _load_trajectory(track_path):
+    """Positions and arena geometry of a track, from the track file and its run metadata."""
+    metadata = load_run_metadata(track_path)
+    if metadata is None:
+        raise ValueError(f"No run metadata for {track_path}; run stats.py with the video instead.")
+    x, y = track_xy(load_track(track_path))
+    return x, y, metadata
+
+
+def _metrics_for(x, y, metadata, params):
+    metrics = compute_metrics(x, y, metadata["fps"], metadata["frame_width"], metadata["frame_height"],
+                              **params)
+    metrics.pop("in_center")
+    metrics["params"] = params
+    return metrics
+
+
+def analyze_tracks(track_path, param_sets, use_cache=True):
+    """
+    Compute the metrics of one track for several parameter sets, loading the track once.
+
+    Args:
+        track_path (str): Track file (.csv or .npy) with its run metadata sidecar.
+        param_sets (list of dict): Keyword arguments for resolve_params, one per analysis.
+        use_cache (bool): Reuse and store results in the analysis cache.
+
+    Returns:
+        results (list of dict): Metrics of each parameter set (without the per-frame arrays).
+    """
+    cache_path = analysis_cache_path(track_path)
+    cache = _load_cache(cache_path) if use_cache else {}
+    x = y = None
+    metadata = load_run_metadata(track_path)
+    results = []
+    dirty = False
+    for kwargs in param_sets:
+        params = resolve_params(metadata, **kwargs)
+        key = params_key(params)
+        if key not in cache:
+            if x is None:
+                x, y, metadata = _load_trajectory(track_path)
+            cache[key] = _metrics_for(x, y, metadata, params)
+            dirty = True
+        results.append(cache[key])
+    if use_cache and dirty:
+        _save_cache(cache_path, cache)
+    return results
+
+
+def analyze_track(track_path, use_cache=True, **kwargs):
+    """Metrics of one track for one parameter set (see resolve_params), cached."""
+    return analyze_tracks(track_path, [kwargs], use_cache=use_cache)[0]
+
+
+def _sweep_track(track_path, center_percents, use_cache):
+    results = analyze_tracks(track_path, [{"center_percent": p} for p in center_percents], use_cache)
+    return [{
+        "track": os.path.basename(track_path),
+        "center_percent": metrics["params"]["center_percent"],
+        "center_fraction": metrics["center_fraction"],
+        "center_seconds": metrics["zone_dwell_seconds"]["center"],
+        "center_entries": metrics["center_entries"],
+        "center_latency_seconds": metrics["center_latency_seconds"],
+    } for metrics in results]
+
+
+def sweep_center_percent(track_paths, center_percents=range(10, 91, 10), workers=None, use_cache=True):
+    """
+    Center-zone metrics of every track for every center size.
+
+    Args:
+        track_paths (list of str): Track files to analyze.
+        center_percents (iterable of int): Center box sizes (side length, % of the arena).
+        workers (int): Worker processes (defaults to the number of cores; 1 runs inline).
+        use_cache (bool): Reuse and store results in the analysis cache.
+
+    Returns:
+        rows (list of dict): One row per (track, center_percent).
+    """
+    center_percents = list(center_percents)
+    workers = min(workers or os.cpu_count() or 1, max(len(track_paths), 1))
+    if workers == 1:
+        per_track = [_sweep_track(path, center_percents, use_cache) for path in track_paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            per_track = list(executor.map(_sweep_track, track_paths,
+                                          [center_percents] * len(track_paths),
+                                          [use_cache] * len(track_paths)))
+    return [row for rows in per_track for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute zone metrics from saved tracks.")
+    parser.add_argument("source", nargs="?", default=os.path.join("outputs", "results"),
+                        help="Track file or results folder (default: outputs/results).")
+    parser.add_argument("--sweep", type=int, nargs=3, metavar=("START", "STOP", "STEP"), default=None,
+                        help="Sweep the center percentage from START to STOP (inclusive).")
+    parser.add_argument("--center-percent", type=int, default=None,
+                        help="Center box size (default: the one the track was recorded with).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument("--output", default=None, help="Write the results to this CSV file.")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and don't update the cache.")
+    args = parser.parse_args()
+
+    track_paths = find_tracks(args.source) if os.path.isdir(args.source) else [args.source]
+    if args.sweep:
+        start, stop, step = args.sweep
+        percents = range(start, stop + 1, step)
+    else:
+        percents = [args.center_percent] if args.center_percent is not None else [None]
+
+    started = time.perf_counter()
+    rows = sweep_center_percent(track_paths, percents, args.workers, use_cache=not args.no_cache)
+    elapsed = time.perf_counter() - started
+
+    import pandas as pd
+    table = pd.DataFrame(rows)
+    print(table.to_string(index=False))
+    print(f"\n{len(rows)} analyses of {len(track_paths)} track(s) in {elapsed:.2f}s")
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"Results saved to {args.output}")
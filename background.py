@@ -0,0 +1,90 @@
+# background.py
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+
+from framing import ENHANCEMENT_PARAMS, RoiEnhancer
+from roi_store import video_hash
+from videoio import open_video
+
+BACKGROUND_CACHE_DIR = os.path.join("outputs", "cache", "backgrounds")
+
+
+def estimate_background(video_path, roi=None, num_samples=50, apply_enhancement=True, backend="opencv"):
+    """
+    Build a static background as the temporal median of frames sampled evenly across the
+    whole video. The mouse moves around, so at any pixel it is only present in a minority
+    of the samples and drops out of the median (an animal that sits still for most of the
+    recording would leave a ghost).
+
+    Args:
+        video_path (str): Path to the video file.
+        roi (tuple): Region of interest (x, y, w, h), or None for the full frame.
+        num_samples (int): Number of frames to sample.
+        apply_enhancement (bool): Enhance the sampled ROI like the tracking pipeline does,
+            so the background matches the frames the tracker sees.
+        backend (str): Video reader backend (see videoio.open_video).
+
+    Returns:
+        background (numpy.ndarray): The background image, or None if the video can't be read.
+    """
+    cap = open_video(video_path, backend)
+    if not cap.isOpened():
+        print("Error opening video file:", video_path)
+        return None
+
+    total_frames = cap.frame_count
+    enhancer = RoiEnhancer(**ENHANCEMENT_PARAMS) if roi is not None and apply_enhancement else None
+    indices = np.linspace(0, max(total_frames - 1, 0), num=min(num_samples, max(total_frames, 1)))
+
+    samples = []
+    for index in np.unique(indices.astype(int)):
+        cap.seek(int(index))
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        if roi is not None:
+            x, y, w, h = roi
+            frame = frame[y:y + h, x:x + w]
+            if enhancer is not None:
+                frame = enhancer(frame)
+        samples.append(frame)
+    cap.release()
+
+    if not samples:
+        print("Error: Could not read any frames to build the background from.")
+        return None
+    return np.median(np.stack(samples), axis=0).astype(np.uint8)
+
+
+def background_cache_path(video_path, roi=None, num_samples=50, apply_enhancement=True):
+    """Cache file of a background, keyed by video content, ROI and sampling parameters."""
+    key = {
+        "video": video_hash(video_path),
+        "roi": [int(v) for v in roi] if roi is not None else None,
+        "num_samples": num_samples,
+        "enhancement": ENHANCEMENT_PARAMS if roi is not None and apply_enhancement else None,
+    }
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+    return os.path.join(BACKGROUND_CACHE_DIR, f"{digest}.png")
+
+
+def get_background(video_path, roi=None, num_samples=50, apply_enhancement=True, backend="opencv"):
+    """
+    Return the cached background of a video/ROI, estimating and caching it if needed.
+    Every backend decodes the same frames, so the cache is shared between them.
+    """
+    cache_path = background_cache_path(video_path, roi, num_samples, apply_enhancement)
+    if os.path.exists(cache_path):
+        background = cv2.imread(cache_path)
+        if background is not None:
+            return background
+
+    background = estimate_background(video_path, roi, num_samples, apply_enhancement, backend)
+    if background is not None:
+        os.makedirs(BACKGROUND_CACHE_DIR, exist_ok=True)
+        cv2.imwrite(cache_path, background)
+    return background
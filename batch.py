@@ -0,0 +1,283 @@
+# batch.py
+import argparse
+import csv
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from framing import get_frame_count, get_video_fps, select_rois
+from main import run_experiment
+from roi_store import get_roi
+from trackio import load_track, track_path_for
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def find_videos(root):
+    """Return a sorted list of all video files below the root directory."""
+    video_paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(VIDEO_EXTENSIONS):
+                video_paths.append(os.path.join(dirpath, filename))
+    video_paths.sort()
+    return video_paths
+
+
+def parse_roi(value):
+    """Parse an "x,y,w,h" string into a ROI tuple. Blank values mean no ROI."""
+    if value is None or not value.strip():
+        return None
+    x, y, w, h = (int(v) for v in value.replace(" ", ",").split(",") if v)
+    return x, y, w, h
+
+
+def load_manifest(manifest_path, start_time=30, duration=300, center_percent=50):
+    """
+    Read a CSV manifest of videos with per-video settings.
+
+    The manifest needs a "video" column; "roi" (as "x,y,w,h"), "start_time", "duration"
+    and "center_percent" are optional and fall back to the given defaults when missing
+    or blank (a blank ROI falls back to the one in the ROI store, see resolve_rois).
+    Relative video paths are resolved against the manifest's folder.
+
+    Returns:
+        jobs (list of dict): One job per video, as accepted by run_batch.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = []
+    with open(manifest_path, newline="") as f:
+        for row in csv.DictReader(f):
+            video_path = row["video"].strip()
+            if not os.path.isabs(video_path):
+                video_path = os.path.join(base_dir, video_path)
+            jobs.append({
+                "video_path": video_path,
+                "roi": parse_roi(row.get("roi")),
+                "start_time": float(row.get("start_time") or start_time),
+                "duration": float(row.get("duration") or duration),
+                "center_percent": int(row.get("center_percent") or center_percent),
+            })
+    return jobs
+
+
+def assign_output_names(jobs, root):
+    """
+    Set the name every job's results are saved under: the video's file name, or, for
+    videos that share a file name, their path relative to root with the folders joined
+    by "_" (session1/cage.mp4 -> session1_cage).
+
+    Raises:
+        ValueError: If two jobs would still write the same results files.
+    """
+    def base_name(path):
+        return os.path.splitext(os.path.basename(path))[0]
+
+    counts = Counter(base_name(job["video_path"]) for job in jobs)
+    for job in jobs:
+        name = base_name(job["video_path"])
+        if counts[name] > 1:
+            relative = os.path.relpath(os.path.abspath(job["video_path"]), os.path.abspath(root))
+            relative = os.path.splitext(relative)[0]
+            name = "_".join(part for part in relative.replace("\\", "/").split("/") if part)
+        job["name"] = name
+
+    duplicates = sorted(name for name, count in Counter(job["name"] for job in jobs).items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Several videos would write the same results: {', '.join(duplicates)}")
+    return jobs
+
+
+def results_track_path(video_path, fmt="csv", name=None):
+    """Path of the track file that run_experiment writes for a video (or output name)."""
+    video_name = name or os.path.splitext(os.path.basename(video_path))[0]
+    return track_path_for(os.path.join("outputs", "results"), video_name, fmt)
+
+
+def expected_frames(job):
+    """Number of frames run_experiment will track for a job (0 if the video can't be read)."""
+    fps = get_video_fps(job["video_path"])
+    if not fps:
+        return 0
+    start_frame = int(job["start_time"] * fps)
+    num_frames = int(job["duration"] * fps)
+    total_frames = get_frame_count(job["video_path"])
+    return max(0, min(num_frames, total_frames - start_frame))
+
+
+def is_complete(job, fmt="csv"):
+    """Check whether the track file of a job already holds every expected frame."""
+    track_path = results_track_path(job["video_path"], fmt, job.get("name"))
+    if not os.path.exists(track_path) or (fmt == "npy" and os.path.exists(track_path + ".part")):
+        return False
+    if fmt == "npy":
+        rows = len(load_track(track_path))
+    else:
+        with open(track_path, newline="") as f:
+            # Don't count the header row.
+            rows = sum(1 for _ in f) - 1
+    expected = expected_frames(job)
+    return expected > 0 and rows >= expected
+
+
+def resolve_rois(jobs, select_missing=False):
+    """
+    Fill in the stored ROI of every job that doesn't specify one.
+
+    Args:
+        jobs (list of dict): Jobs as returned by load_manifest.
+        select_missing (bool): Ask the user to select ROIs for videos without a stored one,
+            all up front, before the batch starts.
+    """
+    for job in jobs:
+        if job["roi"] is None:
+            job["roi"] = get_roi(job["video_path"])
+
+    missing = [job["video_path"] for job in jobs if job["roi"] is None]
+    if select_missing and missing:
+        rois = select_rois(missing)
+        for job in jobs:
+            if job["roi"] is None:
+                job["roi"] = rois.get(job["video_path"])
+    return jobs
+
+
+def _init_worker():
+    # One process per core already; keep OpenCV from oversubscribing each of them.
+    cv2.setNumThreads(1)
+
+
+def _run_job(job, fmt="csv", options=None):
+    """Worker entry point: track one video headlessly and report its throughput."""
+    start = time.perf_counter()
+    frames = run_experiment(
+        job["video_path"],
+        crop=job["roi"] is not None,
+        start_time=job["start_time"],
+        duration=job["duration"],
+        center_percent=job["center_percent"],
+        headless=True,
+        roi=job["roi"],
+        output_format=fmt,
+        output_name=job.get("name"),
+        **(options or {}),
+    )
+    elapsed = time.perf_counter() - start
+    return {"video_path": job["video_path"], "frames": frames, "elapsed": elapsed, "worker": os.getpid()}
+
+
+def run_batch(jobs, workers=None, resume=True, fmt="csv", options=None):
+    """
+    Track many videos across a process pool.
+
+    Args:
+        jobs (list of dict): Jobs as returned by load_manifest. Jobs without an output
+            name get one from assign_output_names, relative to their common folder.
+        workers (int): Number of worker processes (defaults to the number of cores).
+        resume (bool): Skip videos whose track file is already complete.
+        fmt (str): Track output format, "csv" or "npy".
+        options (dict): Extra run_experiment keyword arguments for every job, e.g. the
+            tracker options tracker_scale, grayscale and search_radius.
+
+    Returns:
+        results (list of dict): Frames, elapsed time and worker id of each finished job.
+    """
+    if jobs and any("name" not in job for job in jobs):
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(job["video_path"])) for job in jobs])
+        assign_output_names(jobs, root)
+
+    if resume:
+        pending = [job for job in jobs if not is_complete(job, fmt)]
+        skipped = len(jobs) - len(pending)
+        if skipped:
+            print(f"Skipping {skipped} video(s) with complete results.")
+    else:
+        pending = list(jobs)
+
+    if not pending:
+        print("Nothing to do.")
+        return []
+
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(pending))
+    print(f"Tracking {len(pending)} video(s) on {workers} worker(s).")
+
+    results = []
+    batch_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {executor.submit(_run_job, job, fmt, options): job for job in pending}
+        for done, future in enumerate(as_completed(futures), start=1):
+            job = futures[future]
+            name = job["name"]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[{done}/{len(pending)}] {name}: failed ({e})")
+                continue
+            results.append(result)
+            fps = result["frames"] / result["elapsed"] if result["elapsed"] > 0 else 0.0
+            print(f"[{done}/{len(pending)}] {name}: {result['frames']} frames "
+                  f"in {result['elapsed']:.1f}s ({fps:.1f} frames/sec)")
+    wall_time = time.perf_counter() - batch_start
+
+    print_report(results, wall_time)
+    return results
+
+
+def print_report(results, wall_time):
+    """Print frames/sec per worker process and for the whole batch."""
+    per_worker = defaultdict(lambda: [0, 0.0])
+    for result in results:
+        per_worker[result["worker"]][0] += result["frames"]
+        per_worker[result["worker"]][1] += result["elapsed"]
+
+    print("\nThroughput report")
+    for worker, (frames, elapsed) in sorted(per_worker.items()):
+        fps = frames / elapsed if elapsed > 0 else 0.0
+        print(f"  worker {worker}: {frames} frames in {elapsed:.1f}s ({fps:.1f} frames/sec)")
+    total_frames = sum(result["frames"] for result in results)
+    overall = total_frames / wall_time if wall_time > 0 else 0.0
+    print(f"  overall: {total_frames} frames from {len(results)} video(s) "
+          f"in {wall_time:.1f}s ({overall:.1f} frames/sec)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track every video in a folder tree or manifest.")
+    parser.add_argument("source", help="Folder to scan for videos, or a CSV manifest.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument("--start-time", type=float, default=30, help="Default start time in seconds.")
+    parser.add_argument("--duration", type=float, default=300, help="Default duration in seconds.")
+    parser.add_argument("--center-percent", type=int, default=50, help="Default center area percentage.")
+    parser.add_argument("--no-resume", action="store_true", help="Re-track videos with complete results.")
+    parser.add_argument("--format", choices=["csv", "npy"], default="csv", help="Track output format.")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Track on frames downscaled by this factor (e.g. 0.5).")
+    parser.add_argument("--grayscale", action="store_true", help="Decode and track single-channel frames.")
+    parser.add_argument("--search-radius", type=int, default=None,
+                        help="Only search this many pixels around the last detection.")
+    parser.add_argument("--select-rois", action="store_true",
+                        help="Select ROIs for videos without a stored one before starting.")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        jobs = [{
+            "video_path": video_path,
+            "roi": None,
+            "start_time": args.start_time,
+            "duration": args.duration,
+            "center_percent": args.center_percent,
+        } for video_path in find_videos(args.source)]
+    else:
+        jobs = load_manifest(args.source, args.start_time, args.duration, args.center_percent)
+
+    # Videos in different folders may share a file name; keep their results apart.
+    root = args.source if os.path.isdir(args.source) else os.path.dirname(os.path.abspath(args.source))
+    assign_output_names(jobs, root)
+
+    # Videos without a ROI are tracked on the full frame.
+    resolve_rois(jobs, select_missing=args.select_rois)
+    options = {"tracker_scale": args.scale, "grayscale": args.grayscale, "search_radius": args.search_radius}
+    run_batch(jobs, workers=args.workers, resume=not args.no_resume, fmt=args.format, options=options)
@@ -0,0 +1,114 @@
+# benchmarks/bench_adaptive.py
+#
+# Adaptive frame skipping (sampling.py) against full-rate tracking on a synthetic video
+# with long immobile periods: speedup, share of frames skipped, and the positional error
+# of the held positions against both the full-rate track and the ground truth.
+#
+# The long pauses are what MOG2 needs to keep learning through while frames are skipped,
+# so this doubles as the regression check for that: a configuration whose worst error
+# against the full-rate track exceeds the tolerance is flagged and the script exits with
+# status 1.
+#
+#   python benchmarks/bench_adaptive.py --width 640 --height 480 --frames 1800
+#   python benchmarks/bench_adaptive.py --max-error 30
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sampling import AdaptiveSampler, ChangeDetector
+from synthetic import generate_frames
+from tracking import MouseTracker
+
+CONFIGS = {
+    "max_skip 5": {"max_skip": 5},
+    "max_skip 15": {"max_skip": 15},
+    "max_skip 30": {"max_skip": 30},
+    "max_skip 15, threshold 25": {"max_skip": 15, "pixel_threshold": 25},
+}
+
+# Worst tolerated distance (pixels) between a held position and the full-rate track: about
+# the length of the synthetic mouse at 640x480, i.e. the held position stays on the animal.
+MAX_ERROR_PX = 30.0
+
+
+def run(frames, min_area, max_skip=None, **detector_options):
+    """Track the frames (adaptively when max_skip is set); return positions, seconds, skipped."""
+    tracker = MouseTracker(min_area=min_area)
+    sampler = None
+    if max_skip is not None:
+        sampler = AdaptiveSampler(ChangeDetector(**detector_options), max_skip=max_skip)
+    positions = np.full((len(frames), 2), np.nan)
+    start = time.perf_counter()
+    for i, frame in enumerate(frames):
+        if sampler is not None and not sampler.should_track(frame):
+            coordinate = tracker.skip_frame(frame)
+        else:
+            _, keypoints = tracker.track_frame(frame, annotate=False)
+            coordinate = keypoints[0] if keypoints else tracker.last_coordinate
+        if coordinate is not None:
+            positions[i] = coordinate
+    elapsed = time.perf_counter() - start
+    skipped = sampler.summary()["skipped_fraction"] if sampler is not None else 0.0
+    return positions, elapsed, skipped
+
+
+def errors(positions, reference, skip):
+    """Mean, 95th percentile and max distance between two tracks after the warm-up."""
+    distance = np.hypot(*(positions[skip:] - reference[skip:]).T)
+    distance = distance[~np.isnan(distance)]
+    if distance.size == 0:
+        return float("nan"), float("nan"), float("nan")
+    return float(distance.mean()), float(np.percentile(distance, 95)), float(distance.max())
+
+
+def main(width=640, height=480, num_frames=1800, min_area=200, pause_probability=0.02,
+         max_error=MAX_ERROR_PX):
+    """Print the comparison; return False if any configuration exceeds max_error vs full rate."""
+    frames, truth = [], []
+    for frame, position in generate_frames(width, height, num_frames, pause_probability=pause_probability,
+                                           pause_frames=(30, 300)):
+        frames.append(frame)
+        truth.append(position)
+    truth = np.array(truth)
+    still = np.concatenate(([False], np.all(np.diff(truth, axis=0) == 0, axis=1)))
+    # MOG2 needs a few frames before its first detections are meaningful.
+    skip = min(30, num_frames // 10)
+
+    reference, baseline_seconds, _ = run(frames, min_area)
+    print(f"{num_frames} frames at {width}x{height}, mouse still in {still.mean():.0%} of them")
+    print(f"  {'configuration':<28}{'skipped':>9}{'speedup':>9}"
+          f"{'err vs full (mean/p95/max px)':>32}{'err vs truth (mean px)':>24}")
+    truth_full = errors(reference, truth, skip)[0]
+    print(f"  {'full rate':<28}{0:>8.0%}{1:>8.2f}x{'-':>32}{truth_full:>24.2f}")
+    ok = True
+    for name, config in CONFIGS.items():
+        positions, seconds, skipped = run(frames, min_area, **config)
+        mean, p95, worst = errors(positions, reference, skip)
+        truth_mean = errors(positions, truth, skip)[0]
+        status = "ok" if worst <= max_error else "OVER"
+        ok &= worst <= max_error
+        print(f"  {name:<28}{skipped:>8.0%}{baseline_seconds / seconds:>8.2f}x"
+              f"{mean:>16.2f} / {p95:.2f} / {worst:<7.2f}{truth_mean:>24.2f}  {status}")
+    print(f"  (max error vs full rate tolerated: {max_error:.0f} px)")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark adaptive frame skipping.")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--frames", type=int, default=1800)
+    parser.add_argument("--min-area", type=int, default=200)
+    parser.add_argument("--pause-probability", type=float, default=0.02,
+                        help="Chance per moving frame that the mouse stops (for 30-300 frames).")
+    parser.add_argument("--max-error", type=float, default=MAX_ERROR_PX,
+                        help="Worst tolerated error vs the full-rate track, in pixels.")
+    args = parser.parse_args()
+    ok = main(args.width, args.height, args.frames, args.min_area, args.pause_probability, args.max_error)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,67 @@
+# benchmarks/bench_imports.py
+#
+# Measures the import time of the entry points with `python -X importtime` in a fresh
+# interpreter and checks it against a budget, listing the heaviest imports of any entry
+# point that is over. Exits with status 1 when a budget is exceeded.
+#
+#   python benchmarks/bench_imports.py
+#   python benchmarks/bench_imports.py --repeat 5 --top 15
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time budget per module, in milliseconds. The entry points must not
+# pull in OpenCV, pandas or matplotlib before a command needs them.
+BUDGETS_MS = {
+    "cli": 30,
+    "gui_main": 150,
+    "stats": 250,
+}
+
+
+def import_times(module):
+    """Return {imported module: (self_us, cumulative_us)} for importing module once."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure(module, repeat):
+    """Best-of-repeat cumulative import time of module (ms) and the times of that run."""
+    best = None
+    for _ in range(repeat):
+        times = import_times(module)
+        total = times[module][1] / 1000
+        if best is None or total < best[0]:
+            best = (total, times)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check entry-point import times against a budget.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per module (the best is kept).")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest imports listed when over budget.")
+    args = parser.parse_args()
+
+    over = False
+    for module, budget in BUDGETS_MS.items():
+        total, times = measure(module, args.repeat)
+        status = "ok" if total <= budget else "OVER"
+        print(f"{module:<10} {total:>8.1f} ms  (budget {budget} ms)  {status}")
+        if total > budget:
+            over = True
+            heaviest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+            for name, (self_us, cumulative_us) in heaviest:
+                print(f"    {self_us / 1000:>8.1f} ms self  {cumulative_us / 1000:>8.1f} ms total  {name}")
+    sys.exit(1 if over else 0)
@@ -0,0 +1,80 @@
+# benchmarks/bench_tracker.py
+#
+# Compares MouseTracker configurations against the full-resolution colour tracker:
+# throughput, and centroid error against both that result and the ground truth.
+#
+#   python benchmarks/bench_tracker.py --width 640 --height 480 --frames 600
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import generate_frames
+from tracking import MouseTracker
+
+CONFIGS = {
+    "full resolution": {},
+    "grayscale": {"grayscale": True},
+    "scale 0.5 + grayscale": {"scale": 0.5, "grayscale": True},
+    "scale 0.5 + grayscale + search": {"scale": 0.5, "grayscale": True, "search_radius": 80},
+    "scale 0.25 + grayscale + search": {"scale": 0.25, "grayscale": True, "search_radius": 80},
+}
+
+
+def run_tracker(frames, min_area, **kwargs):
+    """Track all frames and return (positions, frames/sec). Missing positions are NaN."""
+    tracker = MouseTracker(min_area=min_area, **kwargs)
+    positions = np.full((len(frames), 2), np.nan)
+    start = time.perf_counter()
+    for i, frame in enumerate(frames):
+        _, keypoints = tracker.track_frame(frame, annotate=False)
+        if keypoints:
+            positions[i] = keypoints[0]
+    fps = len(frames) / (time.perf_counter() - start)
+    return positions, fps
+
+
+def centroid_error(positions, reference, skip):
+    """Mean and max distance between two tracks, ignoring the warm-up and missing frames."""
+    distance = np.hypot(*(positions[skip:] - reference[skip:]).T)
+    distance = distance[~np.isnan(distance)]
+    if distance.size == 0:
+        return float("nan"), float("nan")
+    return float(distance.mean()), float(distance.max())
+
+
+def main(width=640, height=480, num_frames=600, min_area=200):
+    frames, truth = [], []
+    for frame, position in generate_frames(width, height, num_frames):
+        frames.append(frame)
+        truth.append(position)
+    truth = np.array(truth)
+    # MOG2 needs a few frames before its first detections are meaningful.
+    skip = min(30, num_frames // 10)
+
+    results = {name: run_tracker(frames, min_area, **config) for name, config in CONFIGS.items()}
+    reference, baseline_fps = results["full resolution"]
+
+    print(f"{num_frames} frames at {width}x{height}")
+    print(f"  {'configuration':<34}{'frames/sec':>11}{'speedup':>9}"
+          f"{'err vs full (mean/max px)':>28}{'err vs truth (mean px)':>24}")
+    for name, (positions, fps) in results.items():
+        ref_mean, ref_max = centroid_error(positions, reference, skip)
+        truth_mean, _ = centroid_error(positions, truth, skip)
+        print(f"  {name:<34}{fps:>11.1f}{fps / baseline_fps:>8.2f}x"
+              f"{ref_mean:>18.2f} / {ref_max:<7.2f}{truth_mean:>24.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark MouseTracker configurations.")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--min-area", type=int, default=200)
+    args = parser.parse_args()
+    main(args.width, args.height, args.frames, args.min_area)
@@ -0,0 +1,245 @@
+# benchmarks/run_benchmarks.py
+#
+# Times each pipeline stage on synthetic open-field videos at several resolutions and
+# lengths, and writes a JSON report that can be compared run over run.
+#
+#   python benchmarks/run_benchmarks.py
+#   python benchmarks/run_benchmarks.py --sizes 640x480 1280x960 --lengths 300 1800
+#   python benchmarks/run_benchmarks.py --compare benchmarks/results/<previous>.json
+#
+# Every stage runs in a fresh process so its peak RSS can be measured on its own.
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import cv2
+import numpy as np
+
+from synthetic import truth_path, write_video
+
+STAGES = ("crop_video", "dataloader_images", "crop_frame_store", "dataloader_store", "dataloader_video",
+          "prefetch_video", "tracker", "stats")
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _arena_roi(width, height):
+    """The ROI a user would draw: the arena minus a small border."""
+    margin_x, margin_y = width // 20, height // 20
+    return margin_x, margin_y, width - 2 * margin_x, height - 2 * margin_y
+
+
+def _stage_crop_video(video_path, work_dir, roi):
+    from framing import crop_video
+    start = time.perf_counter()
+    crop_video(video_path, os.path.join(work_dir, "cropped"), roi)
+    return time.perf_counter() - start, {}
+
+
+def _stage_dataloader_images(video_path, work_dir, roi):
+    from dataloader import DataLoader
+    loader = DataLoader(video_path, os.path.join(work_dir, "cropped"))
+    start = time.perf_counter()
+    for _ in loader.load_frames(0, loader.total_frames / loader.fps / 60):
+        pass
+    return time.perf_counter() - start, {}
+
+
+def _stage_crop_frame_store(video_path, work_dir, roi):
+    from framing import crop_video
+    start = time.perf_counter()
+    crop_video(video_path, os.path.join(work_dir, "store"), roi, frame_store=True)
+    return time.perf_counter() - start, {}
+
+
+def _stage_dataloader_store(video_path, work_dir, roi):
+    from dataloader import DataLoader
+    with DataLoader(video_path, os.path.join(work_dir, "store")) as loader:
+        start = time.perf_counter()
+        # Touch every frame so the pages are actually read.
+        for frame in loader.load_frames(0, loader.total_frames / loader.fps / 60):
+            frame.sum()
+        return time.perf_counter() - start, {}
+
+
+def _stage_dataloader_video(video_path, work_dir, roi):
+    from dataloader import DataLoader
+    with DataLoader(video_path, roi=roi) as loader:
+        start = time.perf_counter()
+        for _ in loader.load_frames(0, loader.total_frames / loader.fps / 60):
+            pass
+        return time.perf_counter() - start, {}
+
+
+def _stage_prefetch_video(video_path, work_dir, roi):
+    from dataloader import DataLoader, PrefetchLoader
+    with DataLoader(video_path, roi=roi) as loader:
+        prefetch = PrefetchLoader(loader)
+        start = time.perf_counter()
+        for _ in prefetch.load_frames(0, loader.total_frames / loader.fps / 60):
+            pass
+        return time.perf_counter() - start, {}
+
+
+def _stage_tracker(video_path, work_dir, roi):
+    from dataloader import DataLoader
+    from framing import ENHANCEMENT_PARAMS, RoiEnhancer
+    from tracking import MouseTracker
+    from trackio import TrackWriter, save_run_metadata
+
+    # Decode and enhance up front so only the tracker is timed.
+    with DataLoader(video_path, roi=roi, enhancer=RoiEnhancer(**ENHANCEMENT_PARAMS)) as loader:
+        frames = list(loader.load_frames(0, loader.total_frames / loader.fps / 60))
+        fps = loader.fps
+
+    tracker = MouseTracker(min_area=500 * (roi[2] * roi[3]) / (640 * 480))
+    positions = np.full((len(frames), 2), np.nan)
+    start = time.perf_counter()
+    for i, frame in enumerate(frames):
+        _, keypoints = tracker.track_frame(frame, annotate=False)
+        if keypoints:
+            positions[i] = keypoints[0]
+    elapsed = time.perf_counter() - start
+
+    # Keep the track for the stats stage.
+    track_path = os.path.join(work_dir, "track.csv")
+    with TrackWriter(track_path) as writer:
+        for i, position in enumerate(positions):
+            writer.write(i, None if np.isnan(position[0]) else tuple(int(v) for v in position), False)
+    save_run_metadata(track_path, {"fps": fps, "frame_width": roi[2], "frame_height": roi[3]})
+
+    # Ground truth is in full-frame coordinates; skip MOG2's warm-up frames.
+    truth = np.load(truth_path(video_path))[:len(positions)] - roi[:2]
+    skip = min(30, len(positions) // 10)
+    distance = np.hypot(*(positions[skip:] - truth[skip:]).T)
+    detected = ~np.isnan(distance)
+    extra = {
+        "centroid_error_mean": float(distance[detected].mean()) if detected.any() else None,
+        "centroid_error_p95": float(np.percentile(distance[detected], 95)) if detected.any() else None,
+        "missed_fraction": float(1 - detected.mean()) if distance.size else None,
+    }
+    return elapsed, extra
+
+
+def _stage_stats(video_path, work_dir, roi):
+    os.environ["MPLBACKEND"] = "Agg"
+    from stats import analyze_tracking_data
+    start = time.perf_counter()
+    analyze_tracking_data(os.path.join(work_dir, "track.csv"))
+    return time.perf_counter() - start, {}
+
+
+def _run_stage(stage, video_path, work_dir, roi, num_frames):
+    """Child-process entry point: run one stage and measure it."""
+    # Stage output would drown the report.
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            elapsed, extra = globals()[f"_stage_{stage}"](video_path, work_dir, roi)
+        finally:
+            sys.stdout = stdout
+    return {
+        "stage": stage,
+        "seconds": elapsed,
+        "frames_per_sec": num_frames / elapsed if elapsed > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        **extra,
+    }
+
+
+def run_case(width, height, num_frames, data_dir, stages=STAGES):
+    """Generate (or reuse) one synthetic video and benchmark every stage on it."""
+    video_path = os.path.join(data_dir, f"arena_{width}x{height}_{num_frames}.mp4")
+    if not (os.path.exists(video_path) and os.path.exists(truth_path(video_path))):
+        write_video(video_path, width, height, num_frames)
+
+    roi = _arena_roi(width, height)
+    work_dir = tempfile.mkdtemp(prefix="bench_", dir=data_dir)
+    results = []
+    context = multiprocessing.get_context("spawn")
+    try:
+        for stage in stages:
+            with context.Pool(1) as pool:
+                result = pool.apply(_run_stage, (stage, video_path, work_dir, roi, num_frames))
+            result.update({"width": width, "height": height, "frames": num_frames})
+            results.append(result)
+            print(f"  {width}x{height} {num_frames:>6} frames  {stage:<18} "
+                  f"{result['frames_per_sec']:>9.1f} frames/sec  {result['peak_rss_mb']:>7.1f} MiB"
+                  + (f"  err {result['centroid_error_mean']:.2f}px"
+                     if result.get("centroid_error_mean") is not None else ""))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, previous_path):
+    """Print the frames/sec ratio of every stage against a previous report."""
+    with open(previous_path) as f:
+        previous = json.load(f)
+    key = lambda r: (r["width"], r["height"], r["frames"], r["stage"])
+    before = {key(r): r for r in previous["results"]}
+    print(f"\nCompared with {previous_path}")
+    for result in results:
+        old = before.get(key(result))
+        if old is None or not old.get("frames_per_sec") or not result.get("frames_per_sec"):
+            continue
+        ratio = result["frames_per_sec"] / old["frames_per_sec"]
+        print(f"  {result['width']}x{result['height']} {result['frames']:>6} frames  "
+              f"{result['stage']:<18} {ratio:6.2f}x")
+
+
+def parse_size(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the tracking pipeline on synthetic videos.")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[(640, 480), (1280, 960)],
+                        help="Resolutions as WIDTHxHEIGHT.")
+    parser.add_argument("--lengths", nargs="+", type=int, default=[300, 1800], help="Video lengths in frames.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--data-dir", default=os.path.join(BENCH_DIR, "data"),
+                        help="Where synthetic videos are generated and cached.")
+    parser.add_argument("--output", default=None, help="Report path (default: benchmarks/results/<time>.json).")
+    parser.add_argument("--compare", default=None, help="Previous report to compare against.")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for width, height in args.sizes:
+        for num_frames in args.lengths:
+            results.extend(run_case(width, height, num_frames, args.data_dir, args.stages))
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCH_DIR, "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
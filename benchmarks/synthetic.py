@@ -0,0 +1,111 @@
+# benchmarks/synthetic.py
+#
+# Synthetic open-field frames with a known ground-truth trajectory.
+import numpy as np
+import cv2
+
+
+def make_floor(width, height, seed=0):
+    """A light, slightly textured arena floor."""
+    rng = np.random.default_rng(seed)
+    texture = rng.normal(0, 12, (height // 8 + 1, width // 8 + 1)).astype(np.float32)
+    texture = cv2.resize(texture, (width, height), interpolation=cv2.INTER_CUBIC)
+    floor = np.clip(190 + texture, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(floor, cv2.COLOR_GRAY2BGR)
+
+
+def make_trajectory(width, height, num_frames, seed=0, pause_probability=0.005, pause_frames=(10, 60)):
+    """
+    A smooth random walk that stays inside the arena, with occasional pauses: each moving
+    frame starts a pause with pause_probability, lasting a random number of frames in the
+    pause_frames range.
+    """
+    rng = np.random.default_rng(seed)
+    margin = 0.1
+    position = np.array([width / 2, height / 2], dtype=np.float64)
+    velocity = np.zeros(2)
+    max_speed = 0.02 * min(width, height)
+    trajectory = np.empty((num_frames, 2), dtype=np.float64)
+    paused = 0
+    for i in range(num_frames):
+        if paused > 0:
+            paused -= 1
+        else:
+            velocity = 0.9 * velocity + rng.normal(0, max_speed / 4, 2)
+            speed = np.hypot(*velocity)
+            if speed > max_speed:
+                velocity *= max_speed / speed
+            if rng.random() < pause_probability:
+                paused = int(rng.integers(*pause_frames))
+                velocity[:] = 0
+        position += velocity
+        for axis, size in enumerate((width, height)):
+            low, high = margin * size, (1 - margin) * size
+            if not low <= position[axis] <= high:
+                velocity[axis] = -velocity[axis]
+                position[axis] = np.clip(position[axis], low, high)
+        trajectory[i] = position
+    return trajectory
+
+
+def generate_frames(width=640, height=480, num_frames=300, seed=0, noise=4.0, lighting_drift=0.03,
+                    pause_probability=0.005, pause_frames=(10, 60)):
+    """
+    Yield synthetic BGR frames of a dark "mouse" moving over a textured floor.
+
+    Args:
+        width (int): Frame width.
+        height (int): Frame height.
+        num_frames (int): Number of frames to generate.
+        seed (int): Random seed; the same seed always gives the same video.
+        noise (float): Standard deviation of per-pixel sensor noise.
+        lighting_drift (float): Peak relative change in global brightness over the video.
+        pause_probability (float): Chance per moving frame that the mouse stops.
+        pause_frames (tuple): Range of pause lengths in frames.
+
+    Yields:
+        (frame, (x, y)): The frame and the ground-truth centroid of the mouse.
+    """
+    rng = np.random.default_rng(seed + 1)
+    floor = make_floor(width, height, seed).astype(np.float32)
+    trajectory = make_trajectory(width, height, num_frames, seed, pause_probability, pause_frames)
+    axes = (max(4, int(0.035 * min(width, height))), max(2, int(0.02 * min(width, height))))
+    previous = trajectory[0]
+
+    for i, (x, y) in enumerate(trajectory):
+        gain = 1.0 + lighting_drift * np.sin(2 * np.pi * i / max(num_frames, 1))
+        frame = floor * gain
+        if noise > 0:
+            frame += rng.normal(0, noise, frame.shape).astype(np.float32)
+        frame = np.clip(frame, 0, 255).astype(np.uint8)
+
+        heading = np.degrees(np.arctan2(y - previous[1], x - previous[0]))
+        cv2.ellipse(frame, (int(round(x)), int(round(y))), axes, heading, 0, 360, (40, 35, 30), -1)
+        previous = (x, y)
+        yield frame, (x, y)
+
+
+def write_video(path, width=640, height=480, num_frames=300, fps=30, seed=0, **kwargs):
+    """
+    Write a synthetic arena video and its ground truth (<path without extension>_truth.npy).
+
+    Extra keyword arguments are passed on to generate_frames.
+
+    Returns:
+        truth (numpy.ndarray): (num_frames, 2) array of ground-truth centroids.
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+    truth = np.empty((num_frames, 2), dtype=np.float64)
+    for i, (frame, position) in enumerate(generate_frames(width, height, num_frames, seed, **kwargs)):
+        writer.write(frame)
+        truth[i] = position
+    writer.release()
+    np.save(truth_path(path), truth)
+    return truth
+
+
+def truth_path(video_path):
+    """Path of the ground-truth trajectory saved next to a synthetic video."""
+    return video_path.rsplit(".", 1)[0] + "_truth.npy"
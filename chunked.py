@@ -0,0 +1,210 @@
+# chunked.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from framing import stream_frames
+from instrumentation import StageProfiler
+from motion import ConstantVelocityFilter
+from sampling import AdaptiveSampler
+from tracking import MouseTracker
+
+
+def split_window(start_frame, num_frames, num_chunks):
+    """Split [start_frame, start_frame + num_frames) into contiguous (start, length) chunks."""
+    bounds = np.linspace(start_frame, start_frame + num_frames, num_chunks + 1).astype(int)
+    return [(int(a), int(b - a)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def _init_worker():
+    # One process per chunk already; keep OpenCV from oversubscribing the cores.
+    cv2.setNumThreads(1)
+
+
+def track_chunk(video_path, roi, apply_enhancement, chunk_start, chunk_frames, warmup_frames,
+                background=None, min_area=500, motion_filter=False, scale=1.0, grayscale=False,
+                search_radius=None, backend="opencv", profile=False, max_skip=None):
+    """
+    Worker entry point: track one chunk of the window with its own reader and tracker.
+
+    The tracker first runs over up to warmup_frames frames before the chunk so its
+    background model has settled by the first frame that counts.
+
+    Returns:
+        chunk (dict): Frame indices, x/y (-1 where unknown), whether each frame had a real
+            detection and whether it was skipped by adaptive sampling, the cropped frame
+            shape, the chunk's profiler and its adaptive sampling summary (None when off).
+    """
+    tracker = MouseTracker(min_area=min_area, scale=scale, grayscale=grayscale,
+                           search_radius=search_radius, background=background,
+                           motion_filter=ConstantVelocityFilter() if motion_filter else None)
+    profiler = StageProfiler(log_every=None) if profile else None
+    tracker.profiler = profiler
+    sampler = AdaptiveSampler(max_skip=max_skip) if max_skip is not None else None
+    warm_start = max(0, chunk_start - warmup_frames)
+
+    frames = np.arange(chunk_start, chunk_start + chunk_frames, dtype=np.int32)
+    x = np.full(chunk_frames, -1, dtype=np.int32)
+    y = np.full(chunk_frames, -1, dtype=np.int32)
+    detected = np.zeros(chunk_frames, dtype=bool)
+    skipped = np.zeros(chunk_frames, dtype=bool)
+    frame_shape = None
+    count = 0
+
+    for frame_idx, frame in stream_frames(video_path, roi=roi, start_frame=warm_start,
+                                          num_frames=chunk_start - warm_start + chunk_frames,
+                                          apply_enhancement=apply_enhancement, profiler=profiler,
+                                          backend=backend, grayscale=grayscale):
+        # The warm-up only feeds the background model; adaptive sampling starts with the chunk.
+        skip = False
+        if sampler is not None and frame_idx >= chunk_start:
+            if profiler is not None:
+                started = profiler.start()
+            skip = not sampler.should_track(frame)
+            if profiler is not None:
+                profiler.stop("change_detection", started)
+        if skip:
+            coordinate = tracker.skip_frame(frame)
+        else:
+            _, keypoints = tracker.track_frame(frame, annotate=False)
+            coordinate = keypoints[0] if keypoints else tracker.last_coordinate
+        if frame_idx < chunk_start:
+            if profiler is not None:
+                profiler.count("warmup_frames")
+            continue
+        frame_shape = frame.shape[:2]
+        if coordinate:
+            x[count], y[count] = coordinate
+        detected[count] = tracker.detected
+        skipped[count] = skip
+        count += 1
+        if profiler is not None:
+            profiler.count("frames")
+            if skip:
+                profiler.count("skipped_frames")
+            elif not tracker.detected:
+                profiler.count("dropped_detections")
+
+    return {
+        "frames": frames[:count],
+        "x": x[:count],
+        "y": y[:count],
+        "detected": detected[:count],
+        "skipped": skipped[:count],
+        "frame_shape": frame_shape,
+        "profiler": profiler,
+        "sampling": sampler.summary() if sampler is not None else None,
+    }
+
+
+def stitch_chunks(chunks):
+    """
+    Join chunk tracks into one continuous track.
+
+    A chunk's frames before its first real detection only hold whatever its tracker saw
+    during warm-up. A sequential run would still be holding the last position of the
+    previous chunk there, so that position is carried over the seam instead.
+    """
+    if not chunks:
+        return {
+            "frames": np.zeros(0, dtype=np.int32),
+            "x": np.zeros(0, dtype=np.int32),
+            "y": np.zeros(0, dtype=np.int32),
+            "detected": np.zeros(0, dtype=bool),
+            "skipped": np.zeros(0, dtype=bool),
+        }
+
+    xs, ys, frames, detected, skipped = [], [], [], [], []
+    carry = None
+    for chunk in chunks:
+        x, y = chunk["x"].copy(), chunk["y"].copy()
+        hits = np.flatnonzero(chunk["detected"])
+        first_hit = hits[0] if hits.size else len(x)
+        if carry is not None:
+            x[:first_hit], y[:first_hit] = carry
+        if len(x):
+            last_known = np.flatnonzero(x >= 0)
+            if last_known.size:
+                carry = (x[last_known[-1]], y[last_known[-1]])
+        xs.append(x)
+        ys.append(y)
+        frames.append(chunk["frames"])
+        detected.append(chunk["detected"])
+        skipped.append(chunk.get("skipped", np.zeros(len(x), dtype=bool)))
+    return {
+        "frames": np.concatenate(frames),
+        "x": np.concatenate(xs),
+        "y": np.concatenate(ys),
+        "detected": np.concatenate(detected),
+        "skipped": np.concatenate(skipped),
+    }
+
+
+def track_chunked(video_path, roi, apply_enhancement, start_frame, num_frames, workers=None,
+                  warmup_frames=300, background=None, min_area=500, motion_filter=False, scale=1.0,
+                  grayscale=False, search_radius=None, backend="opencv", profiler=None,
+                  max_skip=None):
+    """
+    Track a long window in parallel: split it into one time chunk per worker process,
+    track each chunk with its own seeking reader, and stitch the results.
+
+    Args:
+        video_path (str): Path to the video file.
+        roi (tuple): Region of interest (x, y, w, h), or None for the full frame.
+        apply_enhancement (bool): Enhance the cropped ROI.
+        start_frame (int): First frame of the window.
+        num_frames (int): Length of the window in frames.
+        workers (int): Number of worker processes (default: all cores).
+        warmup_frames (int): Overlap each chunk's tracker processes before its start. Not
+            needed with a static background, which is accurate from the first frame.
+        background (numpy.ndarray): Optional static background for the trackers.
+        min_area (int): Tracker minimum contour area.
+        motion_filter (bool): Give each chunk's tracker a constant-velocity Kalman filter.
+        scale (float): Tracker processing scale.
+        grayscale (bool): Decode and track single-channel frames.
+        search_radius (int): Tracker search window around the last detection.
+        backend (str): Video reader backend of every worker (see videoio.open_video).
+        profiler (instrumentation.StageProfiler): When given, every worker profiles its
+            chunk and the timings and counters are merged into it.
+        max_skip (int): Sample each chunk adaptively (see sampling.py) with this maximum
+            run of skipped frames; None tracks every frame.
+
+    Returns:
+        track (dict): Stitched frame indices, x, y, detection and skipped flags, the frame
+            shape and the combined adaptive sampling summary (None when off).
+    """
+    workers = workers or os.cpu_count() or 1
+    if background is not None:
+        warmup_frames = 0
+    chunks = split_window(start_frame, num_frames, workers)
+
+    with ProcessPoolExecutor(max_workers=len(chunks), initializer=_init_worker) as executor:
+        futures = [
+            executor.submit(track_chunk, video_path, roi, apply_enhancement, chunk_start,
+                            chunk_frames, warmup_frames, background, min_area, motion_filter,
+                            scale, grayscale, search_radius, backend, profiler is not None, max_skip)
+            for chunk_start, chunk_frames in chunks
+        ]
+        results = [future.result() for future in futures]
+
+    # A chunk past the end of the video comes back empty.
+    results = [result for result in results if len(result["frames"])]
+    track = stitch_chunks(results)
+    track["frame_shape"] = results[0]["frame_shape"] if results else None
+    if profiler is not None:
+        for result in results:
+            profiler.merge(result["profiler"])
+    track["sampling"] = None
+    if max_skip is not None:
+        tracked = sum(result["sampling"]["tracked_frames"] for result in results)
+        skipped = sum(result["sampling"]["skipped_frames"] for result in results)
+        total = tracked + skipped
+        track["sampling"] = {
+            "tracked_frames": tracked,
+            "skipped_frames": skipped,
+            "skipped_fraction": skipped / total if total else 0.0,
+            "max_skip": max_skip,
+        }
+    return track
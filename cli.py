@@ -0,0 +1,61 @@
+# cli.py
+#
+# Single command-line entry point:
+#
+#   python cli.py track video.mp4 --headless
+#   python cli.py crop video.mp4 --frame-store
+#   python cli.py stats outputs/results/video_tracking.csv --no-show
+#   python cli.py plot video --output trajectory.png
+#   python cli.py batch videos/ --workers 4
+#
+# Only the standard library is imported up front; a subcommand's module (and with it
+# OpenCV, pandas or matplotlib) is loaded when that subcommand runs, and its own argument
+# parser handles the remaining arguments (python cli.py <command> --help).
+import os
+import runpy
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Subcommand -> (script, description).
+COMMANDS = {
+    "track": ("main.py", "Track a mouse in a video."),
+    "crop": ("framing.py", "Crop (and enhance) the frames of a video to its ROI."),
+    "stats": ("stats.py", "Print statistics and plot one tracking result."),
+    "plot": (os.path.join("dist", "plot.py"), "Plot the normalized trajectory of a tracked video."),
+    "batch": ("batch.py", "Track every video in a folder tree or manifest."),
+    "analyze": ("analysis.py", "Recompute zone metrics from saved tracks."),
+    "cohort": ("cohort.py", "Summarize every tracking result of a cohort."),
+    "render": ("render.py", "Render the annotated video of a saved track."),
+    "heatmap": ("heatmap.py", "Render occupancy heatmaps of every animal and group."),
+}
+
+
+def usage():
+    lines = ["usage: cli.py <command> [options]", "", "commands:"]
+    lines += [f"  {name:<9} {description}" for name, (_, description) in COMMANDS.items()]
+    lines += ["", "Run 'cli.py <command> --help' for the options of a command."]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command, args = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"Unknown command: {command}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    script = os.path.join(ROOT, COMMANDS[command][0])
+    # Run the script as if it had been started directly, so its own parser does the rest.
+    sys.argv = [script] + args
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    runpy.run_path(script, run_name="__main__")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+# cohort.py
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analysis import analyze_track, find_tracks
+
+COHORT_OUTPUT_DIR = os.path.join("outputs", "cohort")
+
+# Scalar metrics summarized per animal and per group.
+SUMMARY_METRICS = (
+    "center_fraction",
+    "center_entries",
+    "center_latency_seconds",
+    "total_distance",
+    "mean_speed",
+    "immobility_seconds",
+    "immobility_bouts",
+)
+
+
+def animal_name(track_path):
+    """Animal (video or arena) name of a track file: its name without the _tracking suffix."""
+    base = os.path.splitext(os.path.basename(track_path))[0]
+    return base[:-len("_tracking")] if base.endswith("_tracking") else base
+
+
+def load_groups(groups_path):
+    """Map animal name -> group from a CSV with 'animal' and 'group' columns."""
+    groups = pd.read_csv(groups_path, dtype=str)
+    return dict(zip(groups["animal"].str.strip(), groups["group"].str.strip()))
+
+
+def _animal_row(track_path, center_percent):
+    """Per-animal metrics of one track (served from the analysis cache when possible)."""
+    metrics = analyze_track(track_path, center_percent=center_percent)
+    row = {"animal": animal_name(track_path), "track": track_path,
+           "duration_seconds": metrics["duration_seconds"]}
+    for name in SUMMARY_METRICS:
+        value = metrics[name]
+        row[name] = np.nan if value is None else value
+    for zone, seconds in metrics["zone_dwell_seconds"].items():
+        row[f"dwell_{zone}_seconds"] = seconds
+    return row
+
+
+def load_cohort(track_paths, center_percent=None, workers=None):
+    """
+    Per-animal metrics of every track, computed on a process pool.
+
+    Metrics are cached per track file (see analysis.py), so re-running after adding an
+    animal only analyzes the new track. Tracks that fail to load are reported and skipped.
+
+    Returns:
+        animals (pandas.DataFrame): One row per track.
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(track_paths), 1))
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_animal_row, path, center_percent) for path in track_paths]
+        for path, future in zip(track_paths, futures):
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+    return pd.DataFrame(rows)
+
+
+def summarize_groups(animals):
+    """Mean, standard error and count of every metric per group, in one groupby pass."""
+    metric_columns = [c for c in animals.columns if c not in ("animal", "track", "group")]
+    grouped = animals.groupby("group")[metric_columns]
+    summary = grouped.agg(["mean", "sem", "count"])
+    summary.columns = [f"{metric}_{stat}" for metric, stat in summary.columns]
+    return summary.reset_index()
+
+
+def save_figures(animals, output_dir, metrics=SUMMARY_METRICS):
+    """Write one PNG per metric: group means with standard errors and every animal's value."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    groups = sorted(animals["group"].unique())
+    positions = np.arange(len(groups))
+    paths = []
+    for metric in metrics:
+        values = [animals.loc[animals["group"] == group, metric].dropna().to_numpy() for group in groups]
+        means = [v.mean() if v.size else np.nan for v in values]
+        errors = [v.std(ddof=1) / np.sqrt(v.size) if v.size > 1 else 0.0 for v in values]
+
+        fig, ax = plt.subplots(figsize=(max(4, 1.5 * len(groups)), 4))
+        ax.bar(positions, means, yerr=errors, capsize=4, color="lightgray", edgecolor="black")
+        for position, v in zip(positions, values):
+            jitter = np.linspace(-0.15, 0.15, v.size) if v.size > 1 else np.zeros(v.size)
+            ax.scatter(position + jitter, v, color="black", s=12, zorder=3)
+        ax.set_xticks(positions)
+        ax.set_xticklabels(groups)
+        ax.set_ylabel(metric.replace("_", " "))
+        ax.set_title(metric.replace("_", " ").capitalize())
+        fig.tight_layout()
+        path = os.path.join(output_dir, f"{metric}.png")
+        fig.savefig(path, dpi=120)
+        plt.close(fig)
+        paths.append(path)
+    return paths
+
+
+def analyze_cohort(results_folder=os.path.join("outputs", "results"), groups_path=None,
+                   output_dir=COHORT_OUTPUT_DIR, center_percent=None, workers=None, figures=True):
+    """
+    Analyze every track in a results folder and write the cohort summary.
+
+    Args:
+        results_folder (str): Folder with the track files and their run metadata.
+        groups_path (str): CSV mapping animals to groups; without it every animal is in "all".
+        output_dir (str): Where the summary tables and figures are written.
+        center_percent (int): Center box size; None uses the one each track was recorded with.
+        workers (int): Worker processes (defaults to the number of cores).
+        figures (bool): Also write the per-metric figures.
+
+    Returns:
+        animals (pandas.DataFrame): Per-animal metrics.
+        groups (pandas.DataFrame): Per-group summary.
+    """
+    track_paths = find_tracks(results_folder)
+    if not track_paths:
+        raise ValueError(f"No track files found in {results_folder}")
+
+    animals = load_cohort(track_paths, center_percent, workers)
+    if animals.empty:
+        raise ValueError(f"None of the tracks in {results_folder} could be analyzed.")
+    group_of = load_groups(groups_path) if groups_path else {}
+    animals.insert(1, "group", animals["animal"].map(group_of).fillna("all" if not group_of else "ungrouped"))
+    groups = summarize_groups(animals)
+
+    os.makedirs(output_dir, exist_ok=True)
+    animals.to_csv(os.path.join(output_dir, "animals.csv"), index=False)
+    groups.to_csv(os.path.join(output_dir, "groups.csv"), index=False)
+    if figures:
+        save_figures(animals, output_dir)
+    return animals, groups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize every tracking result of a cohort.")
+    parser.add_argument("results", nargs="?", default=os.path.join("outputs", "results"),
+                        help="Results folder (default: outputs/results).")
+    parser.add_argument("--groups", default=None, help="CSV with 'animal' and 'group' columns.")
+    parser.add_argument("--output", default=COHORT_OUTPUT_DIR, help="Output folder.")
+    parser.add_argument("--center-percent", type=int, default=None,
+                        help="Center box size (default: the one each track was recorded with).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument("--no-figures", action="store_true", help="Only write the summary tables.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    animals, groups = analyze_cohort(args.results, args.groups, args.output, args.center_percent,
+                                     args.workers, figures=not args.no_figures)
+    print(groups.to_string(index=False))
+    print(f"\n{len(animals)} animal(s) in {len(groups)} group(s) analyzed in "
+          f"{time.perf_counter() - started:.2f}s; results saved to {args.output}")
@@ -1,6 +1,17 @@
 # dataloader.py
 import cv2
+import json
 import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from framestore import FrameStore, has_frame_store
+from framing import CROP_CACHE_FILE
+from videoio import open_video
 
 
 class DataLoader:
@@ -8,37 +19,76 @@ class DataLoader:
     A memory efficient dataloader that:
       - Extracts the FPS from the original video file without loading all frames.
       - Uses the FPS to convert a given start time (in seconds) into a frame index.
-      - Loads frames (from a folder of cropped frames) corresponding to a duration (in minutes)
-        starting from that time, much like a deep learning data loader.
+      - Loads frames corresponding to a duration (in minutes) starting from that time,
+        much like a deep learning data loader.
+
+    Frames come either from a folder of cropped frames ("images" backend) or are decoded
+    straight from the video ("video" backend), cropped to the ROI on read, so no
+    intermediate frames touch the disk. A cropped folder holding a memory-mapped frame
+    store (see framestore.py) uses the "store" backend instead: frames and slices of frames
+    are zero-copy, read-only views with no decode.
     """
 
-    def __init__(self, video_path, cropped_folder):
+    def __init__(self, video_path, cropped_folder=None, roi=None, enhancer=None, backend="opencv"):
         """
         Args:
             video_path (str): Path to the original video file (used to extract FPS).
-            cropped_frames_folder (str): Folder where the cropped frame images are stored.
+            cropped_folder (str): Folder where the cropped frame images (or a frame store)
+                are stored. When None, frames are decoded directly from the video.
+            roi (tuple): Region of interest (x, y, w, h) to crop decoded frames to
+                (video backend only).
+            enhancer (callable): Optional function applied to each cropped frame, e.g. a
+                framing.RoiEnhancer (video backend only).
+            backend (str): Video reader backend (see videoio.open_video).
         """
         self.video_path = video_path
         self.cropped_frames_folder = cropped_folder
+        self.roi = roi
+        self.enhancer = enhancer
+        if cropped_folder is None:
+            self.backend = "video"
+        elif has_frame_store(cropped_folder):
+            self.backend = "store"
+        else:
+            self.backend = "images"
+        self.reader_backend = backend
+        self._cap = None
+        self.store = None
+        # Video frame index of the first frame available (non-zero for a saved window).
+        self.first_frame = 0
 
         # Extract FPS from the video file without loading the whole video.
         self.fps = self._get_video_fps(video_path)
         if self.fps is None:
             raise ValueError(f"Failed to extract FPS from video: {video_path}")
 
-        # Prepare a sorted list of frame file paths from the cropped frames folder.
-        self.frame_paths = self._get_sorted_frame_paths(cropped_folder)
-        self.total_frames = len(self.frame_paths)
+        if self.backend == "store":
+            self.frame_paths = []
+            self.store = FrameStore(cropped_folder)
+            self.total_frames = len(self.store)
+        elif self.backend == "images":
+            # Prepare a sorted list of frame file paths from the cropped frames folder.
+            # Frames saved by a tracking run cover only its window: file 0 is video frame
+            # first_frame, and indices stay video frame indices.
+            self.frame_paths = self._get_sorted_frame_paths(cropped_folder)
+            marker = self._load_crop_marker(cropped_folder)
+            if marker is not None:
+                self.first_frame = marker.get("start_frame", 0)
+                self.frame_paths = self.frame_paths[:marker["frame_count"]]
+            self.total_frames = self.first_frame + len(self.frame_paths)
+        else:
+            # Keep a single capture open with a sequential read cursor.
+            self.frame_paths = []
+            self._cap = open_video(video_path, backend)
+            self.total_frames = self._cap.frame_count
 
     def _get_video_fps(self, video_path):
         """Open the video file briefly to extract the FPS."""
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            print(f"Error: Cannot open video file {video_path}")
-            return None
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        cap.release()
-        return fps
+        with open_video(video_path, self.reader_backend) as reader:
+            if not reader.isOpened():
+                print(f"Error: Cannot open video file {video_path}")
+                return None
+            return reader.fps
 
     def _get_sorted_frame_paths(self, folder):
         """Return a lexicographically sorted list of image file paths from the folder."""
@@ -52,9 +102,18 @@ class DataLoader:
         full_paths = [os.path.join(folder, f) for f in frame_files]
         return full_paths
 
+    @staticmethod
+    def _load_crop_marker(folder):
+        """The crop cache marker of a cropped frames folder (see framing.py), or None."""
+        marker_path = os.path.join(folder, CROP_CACHE_FILE)
+        if not os.path.exists(marker_path):
+            return None
+        with open(marker_path) as f:
+            return json.load(f)
+
     def get_frame_by_index(self, index):
         """
-        Load a single frame image by its index in the sorted list.
+        Load a single frame by its index (in the sorted list or in the video).
 
         Args:
             index (int): Index of the frame to load.
@@ -62,14 +121,46 @@ class DataLoader:
         Returns:
             frame (numpy.ndarray): The loaded image frame.
         """
-        if index < 0 or index >= self.total_frames:
+        if index < self.first_frame or index >= self.total_frames:
             raise IndexError("Frame index out of range.")
-        frame_path = self.frame_paths[index]
+        if self.backend == "store":
+            return self.store[index]
+        if self.backend == "video":
+            return self._read_video_frame(index)
+        frame_path = self.frame_paths[index - self.first_frame]
         frame = cv2.imread(frame_path)
         if frame is None:
             raise ValueError(f"Could not read frame from {frame_path}")
         return frame
 
+    def get_frames(self, start, stop):
+        """
+        Load the frames in [start, stop) as one (N, H, W, C) array. With a frame store this
+        is a view into the memory map; other backends read and stack the frames.
+        """
+        if start < self.first_frame or stop > self.total_frames or start > stop:
+            raise IndexError("Frame range out of range.")
+        if self.backend == "store":
+            return self.store[start:stop]
+        return np.stack([self.get_frame_by_index(idx) for idx in range(start, stop)])
+
+    def _read_video_frame(self, index, out=None):
+        """
+        Decode a frame from the video, seeking only when access is not sequential.
+        The full decoded frame is written into out when given.
+        """
+        self._cap.seek(index)
+        ret, frame = self._cap.read(out)
+        if not ret:
+            raise ValueError(f"Could not read frame {index} from {self.video_path}")
+
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            frame = frame[y:y + h, x:x + w]
+        if self.enhancer is not None:
+            frame = self.enhancer(frame)
+        return frame
+
     def load_frames(self, start_seconds, duration_minutes):
         """
         Yield frames corresponding to a specified time interval.
@@ -81,6 +172,11 @@ class DataLoader:
         Yields:
             frame (numpy.ndarray): Next frame in the sequence.
         """
+        for idx in self.frame_range(start_seconds, duration_minutes):
+            yield self.get_frame_by_index(idx)
+
+    def frame_range(self, start_seconds, duration_minutes):
+        """Return the range of frame indices covering the given time interval."""
         # Compute the starting frame index using the FPS.
         start_index = int(start_seconds * self.fps)
         # Compute how many frames to load for the given duration.
@@ -89,15 +185,16 @@ class DataLoader:
 
         if start_index >= self.total_frames:
             raise ValueError("The start_seconds is beyond the available frames.")
+        if start_index < self.first_frame:
+            raise ValueError(f"The saved frames start at {self.first_frame / self.fps:.2f}s.")
 
         # Adjust end_index if it goes beyond the available frames.
         if end_index > self.total_frames:
             end_index = self.total_frames
 
-        for idx in range(start_index, end_index):
-            yield self.get_frame_by_index(idx)
+        return range(start_index, end_index)
 
-    def iter_batches(self, start_seconds, duration_minutes, batch_size=32):
+    def iter_batches(self, start_seconds, duration_minutes, batch_size=32, stack=False):
         """
         Yield batches of frames for analysis (optional deep learning style batching).
 
@@ -105,25 +202,207 @@ class DataLoader:
             start_seconds (float): The starting time in seconds.
             duration_minutes (float): Duration (in minutes) of frames to load.
             batch_size (int): Number of frames per batch.
+            stack (bool): Yield each batch as a single (N, H, W[, C]) array.
 
         Yields:
-            batch (list of numpy.ndarray): A list containing a batch of frames.
+            batch (list of numpy.ndarray or numpy.ndarray): A batch of frames.
         """
+        if self.backend == "store" and stack:
+            indices = self.frame_range(start_seconds, duration_minutes)
+            for start in range(indices.start, indices.stop, batch_size):
+                yield self.store[start:min(start + batch_size, indices.stop)]
+            return
+
         batch = []
         for frame in self.load_frames(start_seconds, duration_minutes):
             batch.append(frame)
             if len(batch) == batch_size:
-                yield batch
+                yield np.stack(batch) if stack else batch
                 batch = []
         if batch:
-            yield batch
+            yield np.stack(batch) if stack else batch
 
 
     def get_frame_dimensions(self):
         """Retrieve width and height of a single frame."""
+        if self.backend == "store":
+            height, width = self.store.frame_shape[:2]
+            return width, height
+        if self.backend == "video":
+            if self.roi is not None:
+                return self.roi[2], self.roi[3]
+            return self._cap.frame_size
         if not self.frame_paths:
             raise ValueError("No frames found in the cropped folder.")
         sample_frame = cv2.imread(self.frame_paths[0])
         if sample_frame is None:
             raise ValueError("Failed to load a sample frame.")
-        return sample_frame.shape[1], sample_frame.shape[0]
\ No newline at end of file
+        return sample_frame.shape[1], sample_frame.shape[0]
+
+    def close(self):
+        """Release the video capture (video backend) or frame store."""
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PrefetchLoader:
+    """
+    Wraps a DataLoader and decodes frames ahead of the consumer on background threads,
+    so decoding overlaps with tracking (OpenCV releases the GIL while decoding).
+
+    Frames are always delivered in order. The images backend reads files on a small
+    thread pool; the video backend has a single reader thread (a capture can only be read
+    sequentially) that decodes into a ring of reusable buffers.
+
+    Frames yielded by the video backend without an enhancer are views into those buffers
+    and are only valid until the next frame is requested; copy them if they need to be
+    kept. The wrapped loader must not be used while iterating.
+    """
+
+    def __init__(self, loader, queue_depth=8, num_workers=None):
+        """
+        Args:
+            loader (DataLoader): The loader to prefetch from.
+            queue_depth (int): Maximum number of frames decoded ahead of the consumer.
+            num_workers (int): Reader threads for the images backend (default: up to 4).
+        """
+        self.loader = loader
+        self.queue_depth = max(1, queue_depth)
+        self.num_workers = num_workers or min(4, os.cpu_count() or 1)
+        self.fps = loader.fps
+        self.total_frames = loader.total_frames
+
+    def get_frame_dimensions(self):
+        """Retrieve width and height of a single frame."""
+        return self.loader.get_frame_dimensions()
+
+    def load_frames(self, start_seconds, duration_minutes):
+        """
+        Yield frames corresponding to a specified time interval, decoded ahead of time.
+
+        Args:
+            start_seconds (float): The starting time in seconds.
+            duration_minutes (float): How many minutes of frames to load.
+
+        Yields:
+            frame (numpy.ndarray): Next frame in the sequence.
+        """
+        indices = self.loader.frame_range(start_seconds, duration_minutes)
+        if self.loader.backend == "store":
+            # Already in memory (or the page cache); there is nothing to decode ahead.
+            return (self.loader.store[idx] for idx in indices)
+        if self.loader.backend == "video":
+            return self._prefetch_video(indices)
+        return self._prefetch_images(indices)
+
+    def _prefetch_images(self, indices):
+        """Read image files on a thread pool, keeping at most queue_depth reads in flight."""
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            pending = deque()
+            index_iter = iter(indices)
+            try:
+                for idx in index_iter:
+                    pending.append(executor.submit(self.loader.get_frame_by_index, idx))
+                    if len(pending) >= self.queue_depth:
+                        break
+                while pending:
+                    frame = pending.popleft().result()
+                    idx = next(index_iter, None)
+                    if idx is not None:
+                        pending.append(executor.submit(self.loader.get_frame_by_index, idx))
+                    yield frame
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _prefetch_video(self, indices):
+        """Decode sequentially on a reader thread into a ring of reusable buffers."""
+        width, height = self._full_frame_size()
+        # Frames alive at once: queue_depth queued, one held by the consumer and one being
+        # decoded.
+        ring = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.queue_depth + 2)]
+        frames = queue.Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    frames.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def reader():
+            try:
+                for i, idx in enumerate(indices):
+                    if stop.is_set():
+                        return
+                    put(self.loader._read_video_frame(idx, out=ring[i % len(ring)]))
+            except Exception as e:
+                put(e)
+            put(done)
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = frames.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    def _full_frame_size(self):
+        """Size of a decoded (uncropped) video frame."""
+        return self.loader._cap.frame_size
+
+    def iter_batches(self, start_seconds, duration_minutes, batch_size=32, stack=False):
+        """
+        Yield batches of prefetched frames.
+
+        With stack=True each batch is a (N, H, W[, C]) array filled in place; the same
+        array is reused for every batch (the last one may be a shorter view of it), so
+        copy it if it needs to outlive the next iteration.
+
+        Args:
+            start_seconds (float): The starting time in seconds.
+            duration_minutes (float): Duration (in minutes) of frames to load.
+            batch_size (int): Number of frames per batch.
+            stack (bool): Yield each batch as a single array instead of a list.
+
+        Yields:
+            batch (list of numpy.ndarray or numpy.ndarray): A batch of frames.
+        """
+        batch_array = None
+        batch = []
+        count = 0
+        for frame in self.load_frames(start_seconds, duration_minutes):
+            if stack:
+                if batch_array is None:
+                    batch_array = np.empty((batch_size,) + frame.shape, dtype=frame.dtype)
+                batch_array[count] = frame
+            else:
+                # Frames may live in reusable ring buffers; a list must own its frames.
+                batch.append(frame.copy())
+            count += 1
+            if count == batch_size:
+                yield batch_array if stack else batch
+                batch = []
+                count = 0
+        if count:
+            yield batch_array[:count] if stack else batch
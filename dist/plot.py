@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 import os
-import glob
+import sys
 import argparse
 
 import numpy as np
@@ -9,19 +9,31 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from PIL import Image
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from framestore import FrameStore, has_frame_store  # noqa: E402
+from trackio import load_run_metadata, load_track, track_path_for, track_xy  # noqa: E402
+from zones import center_zone, zone_outline  # noqa: E402
+
 def load_frame_image(videoname):
     """
     Attempt to load an image from outputs/cropped_frames/<videoname>.
-    If <videoname> is a directory, pick the first image (png or jpg).
+    If <videoname> is a directory holding a frame store, take its first frame straight
+    from the memory map; otherwise pick the first image (png or jpg) found in it.
     Otherwise, assume it is a direct file.
     """
     base_path = os.path.join("outputs", "cropped_frames", videoname)
     if os.path.isdir(base_path):
-        # Try to find a PNG or JPG in the directory.
-        image_files = glob.glob(os.path.join(base_path, "*.png")) + glob.glob(os.path.join(base_path, "*.jpg"))
-        if not image_files:
+        if has_frame_store(base_path):
+            store = FrameStore(base_path)
+            if len(store):
+                # Stored frames are BGR, as OpenCV decodes them.
+                return Image.fromarray(np.ascontiguousarray(store[0][..., ::-1]))
+        # Stop at the first PNG or JPG instead of listing the whole directory.
+        with os.scandir(base_path) as entries:
+            image_path = next((entry.path for entry in entries
+                               if entry.name.lower().endswith((".png", ".jpg"))), None)
+        if image_path is None:
             raise FileNotFoundError(f"No image file found in directory: {base_path}")
-        image_path = image_files[0]
     else:
         # Assume base_path is a file path.
         if not os.path.isfile(base_path):
@@ -30,14 +42,27 @@ def load_frame_image(videoname):
 
     return Image.open(image_path)
 
-def main(videoname, inner_area_percent=80, smoothing_window=5):
-    # Load tracking CSV (assumes columns: 'frame', 'x', 'y', and a boolean column)
-    csv_path = os.path.join("outputs", "results", f"{videoname}_tracking.csv")
-    df = pd.read_csv(csv_path)
+def find_track(videoname, results_folder=os.path.join("outputs", "results")):
+    """Track file of a video in the results folder; the .npy track wins when both exist."""
+    for fmt in ("npy", "csv"):
+        track_path = track_path_for(results_folder, videoname, fmt)
+        if os.path.exists(track_path):
+            return track_path
+    raise FileNotFoundError(f"No tracking results for {videoname} in {results_folder}")
+
+def main(videoname, inner_area_percent=80, smoothing_window=5, output=None):
+    # Load the track (frame, x, y, ...; positions are NaN where the mouse wasn't seen)
+    track_path = find_track(videoname)
+    x, y = track_xy(load_track(track_path))
+    df = pd.DataFrame({'x': x, 'y': y})
 
-    # Load an image to get the original dimensions
-    image = load_frame_image(videoname)
-    width, height = image.size
+    # The run metadata records the tracked frame size; only old results without it need
+    # a cropped frame image to get the dimensions.
+    metadata = load_run_metadata(track_path)
+    if metadata and metadata.get("frame_width") and metadata.get("frame_height"):
+        width, height = metadata["frame_width"], metadata["frame_height"]
+    else:
+        width, height = load_frame_image(videoname).size
 
     # Normalize coordinates to a [0,1] range
     df['x_norm'] = df['x'] / width
@@ -58,12 +83,16 @@ def main(videoname, inner_area_percent=80, smoothing_window=5):
     outer_square = plt.Rectangle((0, 0), 1, 1, fill=False, edgecolor='black', linewidth=2, label='Outer Square')
     plt.gca().add_patch(outer_square)
 
-    # Calculate inner square side length so its area is inner_area_percent of the outer square area.
-    # Outer square area is 1; hence side = sqrt(inner_area_percent/100)
-    side_inner = np.sqrt(inner_area_percent / 100)
-    lower_left = ((1 - side_inner) / 2, (1 - side_inner) / 2)
-    inner_square = plt.Rectangle(lower_left, side_inner, side_inner, fill=False, edgecolor='red', linewidth=2, label=f'Inner Square ({inner_area_percent}%)')
-    plt.gca().add_patch(inner_square)
+    # Draw the run's zones (the same definitions tracking and stats use). The inner square's
+    # side is inner_area_percent of the arena's width and height, as in the tracking output.
+    zones = metadata.get("zones") if metadata else None
+    if not zones:
+        zones = [center_zone(inner_area_percent)]
+    for zone in zones:
+        outline = zone_outline(zone, width, height) / np.array([width, height], dtype=np.float64)
+        label = f"Inner Square ({zone['percent']}%)" if zone["type"] == "center" else zone["name"]
+        plt.gca().add_patch(plt.Polygon(outline, closed=True, fill=False, edgecolor='red', linewidth=2,
+                                        label=label))
 
     plt.xlabel("Normalized X")
     plt.ylabel("Normalized Y")
@@ -73,13 +102,25 @@ def main(videoname, inner_area_percent=80, smoothing_window=5):
     plt.ylim(0, 1)
     plt.gca().set_aspect('equal', adjustable='box')
     plt.tight_layout()
-    plt.show()
+    if output is not None:
+        plt.savefig(output)
+        print(f"Figure saved to {output}")
+    else:
+        plt.show()
 
 
 
 if __name__ == "__main__":
-    main(
-        videoname='xage183',
-        inner_area_percent=50,
-        smoothing_window=10
-    )
+    parser = argparse.ArgumentParser(description="Plot the normalized trajectory of a tracked video.")
+    parser.add_argument("videoname", help="Video name (outputs/results/<videoname>_tracking.npy or .csv).")
+    parser.add_argument("--inner-percent", type=int, default=50,
+                        help="Center square side as a percentage of the arena.")
+    parser.add_argument("--smoothing", type=int, default=10, help="Rolling average window in frames.")
+    parser.add_argument("--output", default=None, help="Save the figure here instead of showing it.")
+    args = parser.parse_args()
+
+    if args.output is not None:
+        import matplotlib
+        matplotlib.use("Agg")
+    main(args.videoname, inner_area_percent=args.inner_percent, smoothing_window=args.smoothing,
+         output=args.output)
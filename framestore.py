@@ -0,0 +1,136 @@
+# framestore.py
+import json
+import os
+
+import numpy as np
+
+# A frame store keeps every cropped frame of a video in one preallocated uint8 .npy file,
+# memory-mapped so any frame or range of frames is a zero-copy view with no decode.
+# A small index next to it records how many frames were written and what produced them;
+# it is only written once the store is complete.
+FRAME_STORE_FILE = "frames.npy"
+FRAME_STORE_INDEX = "frames.json"
+
+
+def frame_store_paths(folder):
+    """Paths of the frame array and its index inside a cropped frames folder."""
+    return os.path.join(folder, FRAME_STORE_FILE), os.path.join(folder, FRAME_STORE_INDEX)
+
+
+def has_frame_store(folder):
+    """Whether the folder holds a complete frame store."""
+    array_path, index_path = frame_store_paths(folder)
+    return os.path.exists(array_path) and os.path.exists(index_path)
+
+
+def load_frame_store_index(folder):
+    """The index of a frame store, or None if the folder has no complete store."""
+    if not has_frame_store(folder):
+        return None
+    with open(frame_store_paths(folder)[1]) as f:
+        return json.load(f)
+
+
+class FrameStoreWriter:
+    """
+    Fills a preallocated frame store one frame at a time.
+
+    The array is allocated for the expected number of frames up front; close() records how
+    many were actually written, so a short video just leaves unused capacity at the end.
+    A video with more frames than expected (container headers often under-report) grows
+    the store instead of losing its tail.
+    """
+
+    def __init__(self, folder, capacity, frame_shape, key=None):
+        """
+        Args:
+            folder (str): Folder to create the store in.
+            capacity (int): Number of frames to preallocate.
+            frame_shape (tuple): Shape of one frame, e.g. (h, w, 3).
+            key (str): Identity of the source (e.g. a crop cache key), saved in the index.
+        """
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.key = key
+        self.frame_count = 0
+        array_path, index_path = frame_store_paths(folder)
+        # An index from a previous store must not describe the new, partly written array.
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        self.frames = np.lib.format.open_memmap(array_path, mode="w+", dtype=np.uint8,
+                                                shape=(max(capacity, 1),) + tuple(frame_shape))
+
+    def write(self, frame):
+        """Copy the next frame into the store, growing it when it is full."""
+        if self.frame_count >= len(self.frames):
+            self._grow()
+        self.frames[self.frame_count] = frame
+        self.frame_count += 1
+
+    def _grow(self):
+        """Reallocate the store with half again its capacity and move the frames over."""
+        array_path = frame_store_paths(self.folder)[0]
+        tmp_path = array_path + ".tmp"
+        capacity = len(self.frames) + max(len(self.frames) // 2, 1)
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8,
+                                          shape=(capacity,) + self.frames.shape[1:])
+        grown[:self.frame_count] = self.frames[:self.frame_count]
+        grown.flush()
+        self.frames = None
+        del grown
+        os.replace(tmp_path, array_path)
+        self.frames = np.lib.format.open_memmap(array_path, mode="r+")
+
+    def close(self):
+        """Flush the frames and write the index."""
+        if self.frames is None:
+            return
+        self.frames.flush()
+        shape = self.frames.shape[1:]
+        self.frames = None
+        index = {"key": self.key, "frame_count": self.frame_count, "frame_shape": list(shape)}
+        index_path = frame_store_paths(self.folder)[1]
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class FrameStore:
+    """
+    Read-only access to a frame store. Indexing returns views into the memory map:
+    store[i] is one frame and store[a:b] an (N, H, W, C) block, neither decoded nor copied.
+    """
+
+    def __init__(self, folder):
+        """
+        Args:
+            folder (str): Cropped frames folder holding the store.
+        """
+        index = load_frame_store_index(folder)
+        if index is None:
+            raise FileNotFoundError(f"No complete frame store in {folder}")
+        self.folder = folder
+        self.key = index.get("key")
+        self.frame_count = index["frame_count"]
+        self.frames = np.load(frame_store_paths(folder)[0], mmap_mode="r")[:self.frame_count]
+
+    @property
+    def frame_shape(self):
+        return self.frames.shape[1:]
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    def close(self):
+        """Drop the memory map."""
+        self.frames = None
@@ -1,7 +1,20 @@
 import cv2
+import hashlib
+import json
 import numpy as np
 import os
 
+from framestore import FrameStoreWriter, load_frame_store_index
+from videoio import open_video
+from roi_store import (ROI_STORE_PATH, get_arena_rois, get_roi, save_arena_rois, save_roi,
+                       video_hash)
+
+# Parameters enhance_roi is called with when cropping, recorded in the crop cache key.
+ENHANCEMENT_PARAMS = {"alpha": 1.2, "beta": -25, "gamma": 1.2}
+
+# Marker written next to cropped frames describing what produced them.
+CROP_CACHE_FILE = ".crop_cache.json"
+
 
 def enhance_roi(frame, alpha=1.2, beta=-25, gamma=1.2):
 # def enhance_roi(frame, alpha=1.0, beta=0, gamma=1.2):
@@ -40,6 +53,96 @@ def enhance_roi(frame, alpha=1.2, beta=-25, gamma=1.2):
     return final
 
 
+class RoiEnhancer:
+    """
+    Reusable version of enhance_roi for processing many frames with the same parameters.
+
+    The contrast/brightness and gamma steps are fused into a single 256-entry lookup table
+    computed once, the CLAHE instance is created once, and intermediate images are kept in
+    buffers that are reused as long as the frame size doesn't change.
+    """
+
+    def __init__(self, alpha=1.2, beta=-25, gamma=1.2, clip_limit=2.0, tile_grid_size=(8, 8),
+                 grayscale=False):
+        """
+        Args:
+            alpha (float): Contrast control (1.0 means no change).
+            beta (int): Brightness control (negative values darken the image).
+            gamma (float): Gamma correction value (values > 1 darken the image).
+            clip_limit (float): CLAHE contrast limit.
+            tile_grid_size (tuple): CLAHE tile grid size.
+            grayscale (bool): Return a single-channel luminance image instead of colour.
+                The lookup table is applied after the grey conversion, so results differ
+                slightly from the L channel of the colour path.
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.grayscale = grayscale
+        self.lut = self._build_lut(alpha, beta, gamma)
+        self.clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
+        self._buffers = {}
+
+    @staticmethod
+    def _build_lut(alpha, beta, gamma):
+        """Fuse convertScaleAbs (saturate(|alpha * x + beta|)) and gamma correction."""
+        values = np.arange(256, dtype=np.float64)
+        adjusted = np.clip(np.rint(np.abs(values * alpha + beta)), 0, 255)
+        gamma_table = (((values / 255.0) ** (1.0 / gamma)) * 255).astype(np.uint8)
+        return gamma_table[adjusted.astype(np.uint8)]
+
+    def _buffer(self, name, shape):
+        """Return the named scratch buffer, reallocating it only when the shape changes."""
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+            self._buffers[name] = buf
+        return buf
+
+    def enhance(self, frame, out=None):
+        """
+        Enhance a cropped BGR frame.
+
+        Args:
+            frame (numpy.ndarray): Input cropped color image (or an already grey image
+                in grayscale mode).
+            out (numpy.ndarray): Optional preallocated output (HxWx3, or HxW in grayscale
+                mode). A new array is returned when omitted.
+
+        Returns:
+            final (numpy.ndarray): The enhanced image.
+        """
+        height, width = frame.shape[:2]
+
+        if self.grayscale:
+            gray = self._buffer("gray", (height, width))
+            if frame.ndim == 2:
+                cv2.LUT(frame, self.lut, dst=gray)
+            else:
+                cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+                cv2.LUT(gray, self.lut, dst=gray)
+            self.clahe.apply(gray, dst=gray)
+            return cv2.GaussianBlur(gray, (5, 5), 0, dst=out)
+
+        # 1-2. Brightness, contrast and gamma through the fused lookup table.
+        adjusted = self._buffer("adjusted", (height, width, 3))
+        cv2.LUT(frame, self.lut, dst=adjusted)
+
+        # 3. CLAHE on the luminance channel, without splitting and merging all channels.
+        lab = self._buffer("lab", (height, width, 3))
+        cv2.cvtColor(adjusted, cv2.COLOR_BGR2LAB, dst=lab)
+        lum = self._buffer("lum", (height, width))
+        cv2.extractChannel(lab, 0, dst=lum)
+        self.clahe.apply(lum, dst=lum)
+        cv2.insertChannel(lum, lab, 0)
+        cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=adjusted)
+
+        # 4. Gaussian blur to reduce noise.
+        return cv2.GaussianBlur(adjusted, (5, 5), 0, dst=out)
+
+    __call__ = enhance
+
+
 def select_roi(frame):
     """
     Display a window for the user to select the ROI.
@@ -52,18 +155,67 @@ def select_roi(frame):
     return roi
 
 
-def crop_video(video_path, output_folder, roi, apply_enhancement=True):
+def crop_cache_key(video_path, roi, apply_enhancement=True, grayscale=False):
+    """Content-addressed key of a crop: video hash, ROI and enhancement parameters."""
+    key = {
+        "video": video_hash(video_path),
+        "roi": [int(v) for v in roi] if roi is not None else None,
+        "enhancement": ENHANCEMENT_PARAMS if apply_enhancement else None,
+    }
+    if grayscale:
+        key["grayscale"] = True
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def _cached_crop_is_valid(output_folder, key, frame_store=False):
+    """Check the cache marker in the output folder matches the key and its frames exist."""
+    if frame_store:
+        index = load_frame_store_index(output_folder)
+        return index is not None and index.get("key") == key and index["frame_count"] > 0
+    marker_path = os.path.join(output_folder, CROP_CACHE_FILE)
+    if not os.path.exists(marker_path):
+        return False
+    with open(marker_path) as f:
+        marker = json.load(f)
+    # Frames saved by stream_frames only cover its analysis window.
+    if marker.get("key") != key or marker.get("partial"):
+        return False
+    frame_count = marker.get("frame_count", 0)
+    last_frame = os.path.join(output_folder, f"frame_{frame_count - 1:05d}.png")
+    return frame_count > 0 and os.path.exists(last_frame)
+
+
+def crop_video(video_path, output_folder, roi=None, apply_enhancement=True,
+               store_path=ROI_STORE_PATH, frame_store=False, backend="opencv"):
     """
     Process the video frame by frame, crop each frame to the ROI, optionally enhance it,
     and then save the result.
 
+    If the output folder already holds frames cropped from the same video content with the
+    same ROI and enhancement parameters, the crop is skipped entirely.
+
     Args:
         video_path (str): Path to the video file.
         output_folder (str): Folder where cropped frames will be saved.
-        roi (tuple): Region of interest (x, y, w, h).
+        roi (tuple): Region of interest (x, y, w, h). None uses the ROI stored for the video.
         apply_enhancement (bool): Whether to enhance the ROI before saving.
+        store_path (str): ROI store to look the ROI up in.
+        frame_store (bool): Save the frames into one memory-mapped frame store
+            (framestore.py) instead of one PNG per frame.
+        backend (str): Video reader backend (see videoio.open_video).
     """
-    cap = cv2.VideoCapture(video_path)
+    if roi is None:
+        roi = get_roi(video_path, store_path)
+        if roi is None:
+            print("Error: No ROI given or stored for video:", video_path)
+            return
+
+    key = crop_cache_key(video_path, roi, apply_enhancement)
+    if _cached_crop_is_valid(output_folder, key, frame_store):
+        print(f"Reusing cached cropped frames in '{output_folder}'")
+        return
+
+    cap = open_video(video_path, backend)
     if not cap.isOpened():
         print("Error opening video file:", video_path)
         return
@@ -71,61 +223,301 @@ def crop_video(video_path, output_folder, roi, apply_enhancement=True):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
+    enhancer = RoiEnhancer(**ENHANCEMENT_PARAMS) if apply_enhancement else None
+    x, y, w, h = roi
+    writer = None
+
     frame_count = 0
     while True:
         ret, frame = cap.read()
         if not ret:
             break
 
-        x, y, w, h = roi
         cropped_frame = frame[y:y + h, x:x + w]
 
         # Optionally enhance the cropped frame.
-        if apply_enhancement:
-            cropped_frame = enhance_roi(cropped_frame)
+        if enhancer is not None:
+            cropped_frame = enhancer(cropped_frame)
 
-        frame_filename = os.path.join(output_folder, f"frame_{frame_count:05d}.png")
-        cv2.imwrite(frame_filename, cropped_frame)
+        if frame_store:
+            if writer is None:
+                # Sized from the first frame: the ROI may be clipped at the frame border.
+                capacity = cap.frame_count
+                writer = FrameStoreWriter(output_folder, capacity, cropped_frame.shape, key=key)
+            # Grows past the header's frame count when the header under-reports it.
+            writer.write(cropped_frame)
+        else:
+            frame_filename = os.path.join(output_folder, f"frame_{frame_count:05d}.png")
+            cv2.imwrite(frame_filename, cropped_frame)
         frame_count += 1
 
     cap.release()
+
+    # Only mark the crop as cached once every frame has been written.
+    if frame_store:
+        if writer is not None:
+            writer.close()
+    else:
+        with open(os.path.join(output_folder, CROP_CACHE_FILE), "w") as f:
+            json.dump({"key": key, "frame_count": frame_count}, f)
     print(f"Saved {frame_count} cropped frames to '{output_folder}'")
 
 
-def frame_crop(video_path, output_folder):
+def get_video_fps(video_path, backend="opencv"):
+    """Open the video file briefly to extract the FPS. Returns None on failure."""
+    with open_video(video_path, backend) as reader:
+        if not reader.isOpened():
+            print("Error opening video file:", video_path)
+            return None
+        return reader.fps
+
+
+def get_frame_count(video_path, backend="opencv"):
+    """Open the video file briefly to read its frame count. Returns 0 on failure."""
+    with open_video(video_path, backend) as reader:
+        if not reader.isOpened():
+            print("Error opening video file:", video_path)
+            return 0
+        return reader.frame_count
+
+
+def read_middle_frame(video_path, backend="opencv"):
+    """Read the middle frame of the video, or return None if it can't be read."""
+    with open_video(video_path, backend) as reader:
+        if not reader.isOpened():
+            print("Error opening video file:", video_path)
+            return None
+
+        total_frames = reader.frame_count
+        if total_frames <= 0:
+            print("Error: Video contains no frames.")
+            return None
+
+        reader.seek(total_frames // 2)
+        ret, frame = reader.read()
+    if not ret:
+        print("Error reading the sample frame from the video.")
+        return None
+    return frame
+
+
+def select_video_roi(video_path):
+    """
+    Let the user select a ROI on the middle frame of the video.
+
+    Returns:
+        roi (tuple): Region of interest (x, y, w, h), or None if the video could not be read
+            or the selection was cancelled.
+    """
+    # Use the middle frame for ROI selection.
+    frame = read_middle_frame(video_path)
+    if frame is None:
+        return None
+
+    roi = tuple(int(v) for v in select_roi(frame))
+    # A cancelled selection comes back as (0, 0, 0, 0); never store an empty crop.
+    if roi[2] == 0 or roi[3] == 0:
+        print("ROI selection cancelled.")
+        return None
+    print("Selected ROI:", roi)
+    return roi
+
+
+def select_video_arenas(video_path):
+    """
+    Let the user select one ROI per arena on the middle frame of a video showing several
+    cages. Press ENTER/SPACE after each arena and ESC when all arenas are selected.
+
+    Returns:
+        rois (list of tuple): One (x, y, w, h) per arena, or None if nothing was selected.
+    """
+    frame = read_middle_frame(video_path)
+    if frame is None:
+        return None
+
+    window = "Select arenas - ENTER/SPACE after each, ESC when done"
+    rois = cv2.selectROIs(window, frame, fromCenter=False, showCrosshair=True)
+    cv2.destroyWindow(window)
+    rois = [tuple(int(v) for v in roi) for roi in rois]
+    rois = [roi for roi in rois if roi[2] > 0 and roi[3] > 0]
+    print("Selected arenas:", rois)
+    return rois or None
+
+
+def get_or_select_arenas(video_path, store_path=ROI_STORE_PATH, reselect=False):
+    """
+    Return the arena ROIs stored for the video, asking the user to select them if needed
+    (or always, with reselect).
+    """
+    rois = None if reselect else get_arena_rois(video_path, store_path)
+    if rois is not None:
+        print("Using stored arenas:", rois)
+        return rois
+    rois = select_video_arenas(video_path)
+    if rois is not None:
+        save_arena_rois(video_path, rois, store_path)
+    return rois
+
+
+def stream_frames(video_path, roi=None, start_frame=0, num_frames=None,
+                  apply_enhancement=True, output_folder=None, profiler=None, backend="opencv",
+                  grayscale=False):
     """
-    Opens a video, lets the user select a ROI on a sample frame,
-    then processes the video to crop (and enhance) each frame.
+    Decode the video once, seek straight to start_frame and yield cropped (and
+    optionally enhanced) frames in memory, without a PNG round-trip.
+
+    Args:
+        video_path (str): Path to the video file.
+        roi (tuple): Region of interest (x, y, w, h). None keeps the full frame
+            and skips enhancement.
+        start_frame (int): Index of the first frame to yield.
+        num_frames (int): Maximum number of frames to yield (None reads to the end).
+        apply_enhancement (bool): Whether to enhance the cropped ROI.
+        output_folder (str): Optional folder to also save every yielded frame to
+            as a PNG (opt-in side output). Files are numbered from 0 at start_frame, and
+            the crop cache marker records the window so DataLoader maps them back to
+            video frame indices.
+        profiler (instrumentation.StageProfiler): Optional profiler timing the decode,
+            enhance and save stages.
+        backend (str): Video reader backend (see videoio.open_video).
+        grayscale (bool): Decode (and enhance) single-channel luminance frames, for a
+            tracker that doesn't need colour.
+
+    Yields:
+        (frame_index, frame): Index of the frame in the source video and the frame itself.
     """
-    cap = cv2.VideoCapture(video_path)
+    cap = open_video(video_path, backend, grayscale=grayscale)
     if not cap.isOpened():
         print("Error opening video file:", video_path)
         return
 
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    if total_frames <= 0:
-        print("Error: Video contains no frames.")
+    marker_path = None
+    if output_folder is not None:
+        os.makedirs(output_folder, exist_ok=True)
+        # Drop the marker of an earlier crop until this one is written.
+        marker_path = os.path.join(output_folder, CROP_CACHE_FILE)
+        if os.path.exists(marker_path):
+            os.remove(marker_path)
+
+    enhancer = None
+    if roi is not None and apply_enhancement:
+        enhancer = RoiEnhancer(**ENHANCEMENT_PARAMS, grayscale=grayscale)
+
+    frame_index = start_frame
+    end_frame = None if num_frames is None else start_frame + num_frames
+    reached_end = False
+    try:
+        # Seek once instead of decoding and discarding everything before the window.
+        if start_frame > 0:
+            cap.seek(start_frame)
+
+        while end_frame is None or frame_index < end_frame:
+            if profiler is not None:
+                started = profiler.start()
+            ret, frame = cap.read()
+            if not ret:
+                reached_end = True
+                break
+            if profiler is not None:
+                started = profiler.stop("decode", started)
+
+            if roi is not None:
+                x, y, w, h = roi
+                frame = frame[y:y + h, x:x + w]
+                if enhancer is not None:
+                    frame = enhancer(frame)
+                    if profiler is not None:
+                        started = profiler.stop("enhance", started)
+
+            if output_folder is not None:
+                frame_filename = os.path.join(output_folder, f"frame_{frame_index - start_frame:05d}.png")
+                cv2.imwrite(frame_filename, frame)
+                if profiler is not None:
+                    profiler.stop("save_frame", started)
+
+            yield frame_index, frame
+            frame_index += 1
+    finally:
         cap.release()
-        return
+        if marker_path is not None and frame_index > start_frame:
+            # Mark the saved frames like crop_video does, with the window they cover.
+            # Only a run over the whole video counts as a complete crop for crop_video.
+            key = crop_cache_key(video_path, roi, enhancer is not None, grayscale)
+            with open(marker_path, "w") as f:
+                json.dump({"key": key, "frame_count": frame_index - start_frame,
+                           "start_frame": start_frame,
+                           "partial": not (start_frame == 0 and reached_end)}, f)
 
-    # Use the middle frame for ROI selection.
-    middle_frame_index = total_frames // 2
-    cap.set(cv2.CAP_PROP_POS_FRAMES, middle_frame_index)
 
-    ret, frame = cap.read()
-    cap.release()
-    if not ret:
-        print("Error reading the sample frame from the video.")
-        return
+def get_or_select_roi(video_path, store_path=ROI_STORE_PATH, reselect=False):
+    """
+    Return the ROI stored for the video, asking the user to select (and storing) one
+    if there is none yet, or if reselect is set. A cancelled selection returns None and
+    leaves the store untouched.
+    """
+    roi = None if reselect else get_roi(video_path, store_path)
+    if roi is not None:
+        print("Using stored ROI:", roi)
+        return roi
+    roi = select_video_roi(video_path)
+    if roi is not None:
+        save_roi(video_path, roi, store_path)
+    return roi
 
-    roi = select_roi(frame)
-    print("Selected ROI:", roi)
+
+def select_rois(video_paths, store_path=ROI_STORE_PATH, reselect=False):
+    """
+    Select ROIs for all videos up front, so a long batch can then run unattended.
+
+    Args:
+        video_paths (list of str): Videos to select ROIs for.
+        store_path (str): ROI store to save the selections to.
+        reselect (bool): Also ask again for videos that already have a stored ROI.
+
+    Returns:
+        rois (dict): Maps each video path to its ROI (None if the selection failed).
+    """
+    rois = {}
+    for video_path in video_paths:
+        roi = None if reselect else get_roi(video_path, store_path)
+        if roi is None:
+            print("Select ROI for:", video_path)
+            roi = select_video_roi(video_path)
+            if roi is not None:
+                save_roi(video_path, roi, store_path)
+        rois[video_path] = roi
+    return rois
+
+
+def frame_crop(video_path, output_folder, store_path=ROI_STORE_PATH, frame_store=False,
+               reselect=False):
+    """
+    Opens a video, lets the user select a ROI on a sample frame (unless one is already
+    stored for it and reselect is off), then processes the video to crop (and enhance)
+    each frame.
+    """
+    roi = get_or_select_roi(video_path, store_path, reselect)
+    if roi is None:
+        return
 
     # Process the video: crop, enhance, and save each frame.
-    crop_video(video_path, output_folder, roi, apply_enhancement=True)
+    crop_video(video_path, output_folder, roi, apply_enhancement=True, store_path=store_path,
+               frame_store=frame_store)
 
 
 if __name__ == "__main__":
-    video_path = '061224/cage 183/xage183.mp4'
-    output_folder = "cropped_frames"
-    frame_crop(video_path, output_folder)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crop (and enhance) every frame of a video to its ROI.")
+    parser.add_argument("video_path", help="Path to the video file.")
+    parser.add_argument("output_folder", nargs="?", default=None,
+                        help="Where to save the frames (default: outputs/cropped_frames/<video name>).")
+    parser.add_argument("--frame-store", action="store_true",
+                        help="Save one memory-mapped frame store instead of PNG files.")
+    parser.add_argument("--reselect-roi", action="store_true",
+                        help="Select the ROI again even if one is stored for the video.")
+    args = parser.parse_args()
+
+    video_name = os.path.splitext(os.path.basename(args.video_path))[0]
+    output_folder = args.output_folder or os.path.join("outputs", "cropped_frames", video_name)
+    frame_crop(args.video_path, output_folder, frame_store=args.frame_store, reselect=args.reselect_roi)
@@ -1,6 +1,5 @@
 import tkinter as tk
 from tkinter import filedialog, simpledialog
-from main import run_experiment
 import sys
 import os
 
@@ -50,6 +49,9 @@ def run_gui():
         print("Invalid input. Exiting.")
         return
 
+    # Imported only now so the first dialog isn't held up by OpenCV and the tracking stack.
+    from main import run_experiment
+
     # Run tracking with user inputs
     run_experiment(video_path, crop=crop, start_time=start_time, duration=duration, center_percent=center_percent)
 
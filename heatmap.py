@@ -0,0 +1,260 @@
+# heatmap.py
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from analysis import find_tracks, track_fingerprint
+from cohort import animal_name, load_groups
+from trackio import load_run_metadata, load_track, track_xy
+from zones import zone_outline
+
+HEATMAP_CACHE_DIR = os.path.join("outputs", "cache", "heatmaps")
+HEATMAP_OUTPUT_DIR = os.path.join("outputs", "heatmaps")
+
+# Occupancy grids hold the seconds spent in each cell of the normalized arena, binned in
+# one pass over the track. The raw grids are cached per track file (keyed like the analysis
+# cache, plus the grid size) in outputs/cache/heatmaps/<track>_<fingerprint>_<bins>.npy.
+# Smoothing is linear, so it is applied once to a summed group map rather than to every
+# animal's grid, and cached grids stay independent of it.
+
+DEFAULT_BINS = 50
+
+
+def occupancy_grid(x, y, fps, frame_width, frame_height, bins=DEFAULT_BINS):
+    """
+    Seconds spent in each cell of a bins x bins grid over the normalized arena.
+
+    Args:
+        x, y (numpy.ndarray): Positions in pixels, NaN where the mouse was not seen.
+        fps (float): Frame rate; every frame with a position adds 1/fps seconds.
+        frame_width, frame_height (int): Arena size in pixels (the tracked frame).
+        bins (int): Cells per side.
+
+    Returns:
+        grid (numpy.ndarray): (bins, bins) float64 array indexed [row (y), column (x)].
+    """
+    seen = ~(np.isnan(x) | np.isnan(y))
+    columns = np.clip((x[seen] * (bins / frame_width)).astype(np.intp), 0, bins - 1)
+    rows = np.clip((y[seen] * (bins / frame_height)).astype(np.intp), 0, bins - 1)
+    counts = np.bincount(rows * bins + columns, minlength=bins * bins)
+    return counts.reshape(bins, bins) / float(fps)
+
+
+def heatmap_cache_path(track_path, bins=DEFAULT_BINS):
+    """Cache file of the occupancy grid of the current version of a track."""
+    name = os.path.splitext(os.path.basename(track_path))[0]
+    return os.path.join(HEATMAP_CACHE_DIR, f"{name}_{track_fingerprint(track_path)}_{bins}.npy")
+
+
+def track_occupancy(track_path, bins=DEFAULT_BINS, use_cache=True):
+    """
+    Occupancy grid (seconds per cell) of one track, served from the cache when possible.
+
+    Args:
+        track_path (str): Track file (.csv or .npy) with its run metadata sidecar.
+        bins (int): Cells per side.
+        use_cache (bool): Reuse and store grids in the heatmap cache.
+    """
+    cache_path = heatmap_cache_path(track_path, bins)
+    if use_cache and os.path.exists(cache_path):
+        try:
+            return np.load(cache_path)
+        except (OSError, ValueError):
+            pass
+
+    metadata = load_run_metadata(track_path)
+    if metadata is None:
+        raise ValueError(f"No run metadata for {track_path}; the arena size and fps are needed.")
+    x, y = track_xy(load_track(track_path))
+    grid = occupancy_grid(x, y, metadata["fps"], metadata["frame_width"], metadata["frame_height"], bins)
+    if use_cache:
+        os.makedirs(HEATMAP_CACHE_DIR, exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, grid)
+        os.replace(tmp_path, cache_path)
+    return grid
+
+
+def load_occupancies(track_paths, bins=DEFAULT_BINS, workers=None, use_cache=True):
+    """
+    Occupancy grids of many tracks, computed on a process pool (1 worker runs inline).
+    Tracks that fail to load are reported and skipped.
+
+    Returns:
+        grids (dict): Track path -> occupancy grid.
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(track_paths), 1))
+    grids = {}
+    if workers == 1:
+        for path in track_paths:
+            try:
+                grids[path] = track_occupancy(path, bins, use_cache)
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+        return grids
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(track_occupancy, path, bins, use_cache) for path in track_paths]
+        for path, future in zip(track_paths, futures):
+            try:
+                grids[path] = future.result()
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+    return grids
+
+
+def group_maps(grids, group_of, fraction=False):
+    """
+    Average occupancy map of each group.
+
+    Args:
+        grids (dict): Animal name -> occupancy grid.
+        group_of (dict): Animal name -> group name.
+        fraction (bool): Scale every animal's grid to sum to 1 first, so animals tracked
+                         for different durations weigh the same.
+
+    Returns:
+        maps (dict): Group name -> (mean grid, number of animals).
+    """
+    sums, counts = {}, {}
+    for animal, grid in grids.items():
+        if fraction:
+            total = grid.sum()
+            grid = grid / total if total > 0 else grid
+        group = group_of[animal]
+        if group in sums:
+            sums[group] += grid
+        else:
+            sums[group] = grid.astype(np.float64, copy=True)
+        counts[group] = counts.get(group, 0) + 1
+    return {group: (sums[group] / counts[group], counts[group]) for group in sorted(sums)}
+
+
+def smooth_grid(grid, sigma):
+    """Gaussian smoothing of a grid, with sigma in cells (0 returns the grid unchanged)."""
+    if not sigma:
+        return grid
+    # Reflecting at the walls keeps the time spent along them inside the arena.
+    return cv2.GaussianBlur(grid.astype(np.float64), (0, 0), sigma, borderType=cv2.BORDER_REFLECT)
+
+
+def render_heatmap(grid, path, title=None, zones=None, label="Seconds", cmap="inferno", vmax=None):
+    """
+    Write an occupancy map to an image file. Uses a bare matplotlib Figure on the Agg
+    canvas, so it needs no display and leaves no pyplot state behind between maps.
+
+    Args:
+        grid (numpy.ndarray): Occupancy grid indexed [row (y), column (x)].
+        path (str): Output image path (the format follows the extension).
+        title (str): Figure title.
+        zones (list of dict): Zones to outline (see zones.py).
+        label (str): Colorbar label.
+        cmap (str): Matplotlib colormap.
+        vmax (float): Upper end of the color scale (default: the grid's maximum).
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Polygon
+
+    fig = Figure(figsize=(5, 4.4))
+    ax = fig.add_subplot()
+    image = ax.imshow(grid, cmap=cmap, vmin=0, vmax=vmax, extent=(0, 1, 1, 0), interpolation="nearest")
+    fig.colorbar(image, ax=ax, label=label)
+    # Outline the zones in a 1000 px arena so the normalized outlines keep their precision.
+    for zone in zones or ():
+        outline = zone_outline(zone, 1000, 1000) / 1000.0
+        ax.add_patch(Polygon(outline, closed=True, fill=False, edgecolor="white", linewidth=1))
+    ax.set_xlim(0, 1)
+    ax.set_ylim(1, 0)
+    ax.set_xlabel("Normalized X")
+    ax.set_ylabel("Normalized Y")
+    if title:
+        ax.set_title(title)
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+    return path
+
+
+def make_heatmaps(results_folder=os.path.join("outputs", "results"), groups_path=None,
+                  output_dir=HEATMAP_OUTPUT_DIR, bins=DEFAULT_BINS, sigma=1.0, fraction=False,
+                  per_animal=True, workers=None, use_cache=True):
+    """
+    Occupancy heatmaps of every track in a results folder and of every group.
+
+    Writes <animal>.png for each track (unless per_animal is off) and group_<group>.png
+    with the group's mean map, whose unsmoothed grid is also saved as group_<group>.npy.
+
+    Args:
+        results_folder (str): Folder with the track files and their run metadata.
+        groups_path (str): CSV mapping animals to groups; without it every animal is in "all".
+        output_dir (str): Where the images and group grids are written.
+        bins (int): Cells per side of the grids.
+        sigma (float): Gaussian smoothing of the rendered maps, in cells (0 disables it).
+        fraction (bool): Show the fraction of tracked time instead of seconds.
+        per_animal (bool): Also render every animal's map.
+        workers (int): Worker processes for the grids (defaults to the number of cores).
+        use_cache (bool): Reuse and store per-track grids in the heatmap cache.
+
+    Returns:
+        maps (dict): Group name -> (mean grid, number of animals).
+    """
+    track_paths = find_tracks(results_folder)
+    if not track_paths:
+        raise ValueError(f"No track files found in {results_folder}")
+    by_path = load_occupancies(track_paths, bins, workers, use_cache)
+    if not by_path:
+        raise ValueError(f"None of the tracks in {results_folder} could be loaded.")
+
+    grids = {animal_name(path): grid for path, grid in by_path.items()}
+    zones = {animal_name(path): (load_run_metadata(path) or {}).get("zones") for path in by_path}
+    group_of = load_groups(groups_path) if groups_path else {}
+    default_group = "ungrouped" if group_of else "all"
+    group_of = {animal: group_of.get(animal, default_group) for animal in grids}
+    label = "Fraction of time" if fraction else "Seconds"
+
+    os.makedirs(output_dir, exist_ok=True)
+    if per_animal:
+        for animal, grid in grids.items():
+            if fraction and grid.sum() > 0:
+                grid = grid / grid.sum()
+            render_heatmap(smooth_grid(grid, sigma), os.path.join(output_dir, f"{animal}.png"),
+                           title=animal, zones=zones[animal], label=label)
+
+    maps = group_maps(grids, group_of, fraction)
+    for group, (grid, count) in maps.items():
+        np.save(os.path.join(output_dir, f"group_{group}.npy"), grid)
+        # Outline the zones only when every animal of the group shares them.
+        group_zones = [zones[animal] for animal in grids if group_of[animal] == group]
+        shared = group_zones[0] if all(z == group_zones[0] for z in group_zones) else None
+        title = f"{group} (mean of {count} animal{'s' if count != 1 else ''})"
+        render_heatmap(smooth_grid(grid, sigma), os.path.join(output_dir, f"group_{group}.png"),
+                       title=title, zones=shared, label=label)
+    return maps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render occupancy heatmaps of tracked animals and groups.")
+    parser.add_argument("results", nargs="?", default=os.path.join("outputs", "results"),
+                        help="Results folder (default: outputs/results).")
+    parser.add_argument("--groups", default=None, help="CSV with 'animal' and 'group' columns.")
+    parser.add_argument("--output", default=HEATMAP_OUTPUT_DIR, help="Output folder.")
+    parser.add_argument("--bins", type=int, default=DEFAULT_BINS, help="Grid cells per side.")
+    parser.add_argument("--sigma", type=float, default=1.0,
+                        help="Gaussian smoothing in grid cells (0 disables it).")
+    parser.add_argument("--fraction", action="store_true",
+                        help="Show the fraction of tracked time instead of seconds.")
+    parser.add_argument("--groups-only", action="store_true", help="Only render the group maps.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and don't update the cache.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    maps = make_heatmaps(args.results, args.groups, args.output, args.bins, args.sigma, args.fraction,
+                         per_animal=not args.groups_only, workers=args.workers,
+                         use_cache=not args.no_cache)
+    animals = sum(count for _, count in maps.values())
+    print(f"Heatmaps of {animals} animal(s) in {len(maps)} group(s) written to {args.output} "
+          f"in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,115 @@
+# instrumentation.py
+import json
+import time
+
+# Histogram buckets are powers of two of microseconds: bucket i holds durations in
+# [2**(i-1), 2**i) us, so 32 buckets cover everything up to over an hour.
+NUM_BUCKETS = 32
+
+
+class StageProfiler:
+    """
+    Low-overhead per-stage timing for the tracking loop.
+
+    Callers time a stage with ``started = profiler.start()`` and
+    ``profiler.stop("stage", started)``. Each stage keeps a call count, total/min/max time
+    and a log2 histogram of durations. Code paths hold ``None`` instead of a profiler
+    when instrumentation is disabled, so the only cost then is an ``is not None`` check.
+    """
+
+    def __init__(self, log_every=10.0):
+        """
+        Args:
+            log_every (float): Seconds between progress log lines (None disables them).
+        """
+        self.log_every = log_every
+        self.stages = {}
+        self.counters = {}
+        self._created = time.perf_counter()
+        self._last_log = self._created
+
+    start = staticmethod(time.perf_counter)
+
+    def stop(self, stage, started):
+        """Record the time since started for the stage. Returns the current time."""
+        now = time.perf_counter()
+        elapsed = now - started
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = [0, 0.0, float("inf"), 0.0, [0] * NUM_BUCKETS]
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed < stats[2]:
+            stats[2] = elapsed
+        if elapsed > stats[3]:
+            stats[3] = elapsed
+        stats[4][min(int(elapsed * 1e6).bit_length(), NUM_BUCKETS - 1)] += 1
+        return now
+
+    def count(self, name, n=1):
+        """Increment a counter such as frames processed or dropped detections."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        """
+        Add the timings and counters of another profiler, e.g. one that ran in a worker
+        process. Stage totals then add up the time spent in every process.
+        """
+        for stage, (calls, total, minimum, maximum, histogram) in other.stages.items():
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = [0, 0.0, float("inf"), 0.0, [0] * NUM_BUCKETS]
+            stats[0] += calls
+            stats[1] += total
+            stats[2] = min(stats[2], minimum)
+            stats[3] = max(stats[3], maximum)
+            stats[4] = [a + b for a, b in zip(stats[4], histogram)]
+        for name, n in other.counters.items():
+            self.count(name, n)
+
+    def maybe_log(self):
+        """Print a progress line if log_every seconds have passed since the last one."""
+        if self.log_every is None:
+            return
+        now = time.perf_counter()
+        if now - self._last_log >= self.log_every:
+            self._last_log = now
+            print(self.progress_line(now))
+
+    def progress_line(self, now=None):
+        """One-line summary of throughput and mean time per stage."""
+        now = now or time.perf_counter()
+        frames = self.counters.get("frames", 0)
+        fps = frames / (now - self._created) if now > self._created else 0.0
+        parts = [f"{frames} frames ({fps:.1f} frames/sec)"]
+        for stage, (calls, total, _, _, _) in self.stages.items():
+            parts.append(f"{stage} {total / calls * 1e3:.2f}ms")
+        return " | ".join(parts)
+
+    def summary(self):
+        """All timings and counters as a JSON-serialisable dict."""
+        wall_time = time.perf_counter() - self._created
+        frames = self.counters.get("frames", 0)
+        stages = {}
+        for stage, (calls, total, minimum, maximum, histogram) in self.stages.items():
+            stages[stage] = {
+                "calls": calls,
+                "total_seconds": total,
+                "mean_ms": total / calls * 1e3,
+                "min_ms": minimum * 1e3,
+                "max_ms": maximum * 1e3,
+                "share_of_wall_time": total / wall_time if wall_time > 0 else None,
+                # Upper bound of each bucket in microseconds -> number of calls.
+                "histogram_us": {str(1 << i): n for i, n in enumerate(histogram) if n},
+            }
+        return {
+            "wall_seconds": wall_time,
+            "frames_per_sec": frames / wall_time if wall_time > 0 else None,
+            "counters": dict(self.counters),
+            "stages": stages,
+        }
+
+    def save(self, path):
+        """Write the summary as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
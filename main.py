@@ -1,79 +1,481 @@
 # main.py
+import argparse
 import cv2
-import csv
+import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-from framing import frame_crop
-from dataloader import DataLoader
+from background import get_background
+from chunked import track_chunked
+from framing import (ENHANCEMENT_PARAMS, RoiEnhancer, get_or_select_arenas, get_or_select_roi,
+                     get_video_fps, stream_frames)
 from tracking import MouseTracker
+from instrumentation import StageProfiler
+from motion import ConstantVelocityFilter
+from sampling import AdaptiveSampler
+from render import AnnotatedVideoWriter, annotated_video_path, render_track
+from roi_store import video_hash
+from trackio import TrackWriter, save_run_metadata, track_path_for
+from zones import ZoneMap, center_zone, load_zones
+
+
+def _run_metadata(video_path, fps, roi, frame_width, frame_height, start_frame, frames_tracked,
+                  center_percent, tracker, output_format, zones, sampling=None, render=None):
+    """Metadata saved next to a track so analysis never has to reopen the video."""
+    return {
+        "video_path": os.path.abspath(video_path),
+        "video_hash": video_hash(video_path),
+        "fps": fps,
+        "roi": list(roi) if roi is not None else None,
+        "frame_width": frame_width,
+        "frame_height": frame_height,
+        "start_frame": start_frame,
+        "num_frames": frames_tracked,
+        "center_percent": center_percent,
+        "zones": zones,
+        "tracker": {
+            "min_area": tracker.min_area,
+            "scale": tracker.scale,
+            "grayscale": tracker.grayscale,
+            "search_radius": tracker.search_radius,
+            "background": tracker.background is not None,
+            "motion_filter": tracker.motion_filter is not None,
+        },
+        "format": output_format,
+        "sampling": sampling,
+        "render": render,
+    }
+
+
+def run_experiment(video_path, crop=True, start_time=30, duration=300, center_percent=50,
+                   save_frames=False, headless=False, preview_every=1, roi=None,
+                   output_format="csv", profile=False, bootstrap_background=False, workers=1,
+                   warmup_seconds=10, motion_filter=False, zones=None, decoder="opencv",
+                   render_video=False, adaptive=False, max_skip=15, output_name=None,
+                   reselect_roi=False, tracker_scale=1.0, grayscale=False, search_radius=None):
+    """
+    Track the mouse over a time window of the video and save the results.
+
+    Args:
+        video_path (str): Path to the video file.
+        crop (bool): Select a ROI and crop (and enhance) each frame to it.
+        start_time (float): Start of the analysis window in seconds.
+        duration (float): Length of the analysis window in seconds.
+        center_percent (int): Side length of the center box as a percentage of the frame's
+            width and height.
+        save_frames (bool): Also write the cropped frames to outputs/cropped_frames.
+        headless (bool): Skip all drawing and display, e.g. on servers without a screen.
+        preview_every (int): When not headless, only annotate and show every Nth frame.
+        roi (tuple): ROI (x, y, w, h) to crop to. When None and crop is set, the ROI stored
+            for the video is used, or the user is asked to select one.
+        output_format (str): "csv", or "npy" for a compact binary track (see trackio).
+        profile (bool): Time every stage of the loop, log progress periodically and save a
+            <name>_tracking_profile.json summary next to the results.
+        bootstrap_background (bool): Track against a cached median background sampled from
+            the whole video instead of a MOG2 model that has to warm up from start_time.
+        workers (int): Split the window into this many time chunks tracked by separate
+            processes and stitched together (headless only, and without save_frames; see
+            chunked.py).
+        warmup_seconds (float): Overlap each chunk's MOG2 model processes before its start.
+        motion_filter (bool): Gate detections with a constant-velocity Kalman filter and fill
+            missed frames with its prediction (marked as not observed in the track).
+        zones (list of dict): Extra zone definitions (see zones.py) saved with the run so
+            stats and plots use the same regions. The center zone is always included.
+        decoder (str): Video reader backend, "opencv", "pyav" or "auto" (see videoio.py).
+        render_video (bool): Also render an annotated MP4 (box, centroid, zones and trail)
+            next to the results, on a writer thread (see render.py). Chunked runs render it
+            from the saved track afterwards, which records it in the metadata too.
+        adaptive (bool): Only run the tracker when a cheap change detector sees motion, or
+            every max_skip frames; skipped frames hold the last position and are marked
+            as skipped in the track (see sampling.py).
+        max_skip (int): Longest run of frames skipped in adaptive mode.
+        output_name (str): Name the results are saved under (default: the video's file
+            name without extension).
+        reselect_roi (bool): Ask for the ROI again (and store it) even if one is stored
+            for the video. Ignored when roi is given.
+        tracker_scale (float): Downscale factor the tracker processes frames at (see
+            tracking.MouseTracker); positions are still full-resolution pixels.
+        grayscale (bool): Decode, enhance and track single-channel luminance frames.
+        search_radius (int): Limit contour analysis to this many pixels around the last
+            detection (None searches the whole frame).
+
+    Returns:
+        frames_tracked (int): Number of frames written to the results file.
+    """
+    if preview_every < 1:
+        raise ValueError(f"preview_every must be at least 1, got {preview_every}")
+    if workers > 1 and save_frames:
+        raise ValueError("save_frames needs a sequential run (workers=1); crop the video with "
+                         "framing.py to keep the cropped frames of a parallel run.")
 
-def draw_center_box(frame, percent=50):
-    """Draws a centered rectangle covering n% of the frame's area."""
-    height, width = frame.shape[:2]
-    box_w = int(width * percent / 100)
-    box_h = int(height * percent / 100)
-    top_left = ((width - box_w) // 2, (height - box_h) // 2)
-    bottom_right = (top_left[0] + box_w, top_left[1] + box_h)
-    cv2.rectangle(frame, top_left, bottom_right, (0, 255, 255), 2)
-    return top_left, bottom_right
-
-def is_inside_box(coordinate, top_left, bottom_right):
-    """Checks if a coordinate (x,y) is inside the defined center box."""
-    if coordinate:
-        x, y = coordinate
-        return top_left[0] <= x <= bottom_right[0] and top_left[1] <= y <= bottom_right[1]
-    return False
-
-
-def run_experiment(video_path, crop=True, start_time=30, duration=300, center_percent=50):
     # Extract the video name without extension
-    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    video_name = output_name or os.path.splitext(os.path.basename(video_path))[0]
 
     # Set up output directories
     results_folder = os.path.join("outputs", "results")
     os.makedirs(results_folder, exist_ok=True)
-    output_csv = os.path.join(results_folder, f"{video_name}_tracking.csv")
+    output_path = track_path_for(results_folder, video_name, output_format)
+
+    fps = get_video_fps(video_path, decoder)
+    if not fps:
+        raise ValueError(f"Failed to extract FPS from video: {video_path}")
+    print(f"Video FPS: {fps}")
+
+    if not crop:
+        roi = None
+    elif roi is None:
+        roi = get_or_select_roi(video_path, reselect=reselect_roi)
+        if roi is None:
+            return 0
 
-    if crop:
+    # Writing the cropped frames to disk is an opt-in side output.
+    cropped_frames_folder = None
+    if save_frames:
         cropped_frames_folder = os.path.join("outputs", "cropped_frames", video_name)
-        os.makedirs(cropped_frames_folder, exist_ok=True)
-        # Crop frames and save to the designated folder
-        frame_crop(video_path, cropped_frames_folder)
-        # Use the cropped frames folder for DataLoader
-        loader = DataLoader(video_path, cropped_frames_folder)
+
+    # Instrumentation is opt-in; with profile off every hook is a single None check.
+    profiler = StageProfiler() if profile else None
+
+    background = None
+    if bootstrap_background:
+        background = get_background(video_path, roi, apply_enhancement=crop, backend=decoder)
+
+    tracker = MouseTracker(min_area=500, scale=tracker_scale, grayscale=grayscale,
+                           search_radius=search_radius, background=background,
+                           motion_filter=ConstantVelocityFilter() if motion_filter else None)
+    tracker.profiler = profiler
+    start_frame = int(start_time * fps)
+    num_frames = int(duration * fps)
+    zone_defs = [center_zone(center_percent)] + list(zones or [])
+    sampling = None
+    render = None
+
+    if workers > 1:
+        # Chunks are tracked in parallel, so there is no live preview.
+        track = track_chunked(video_path, roi, crop, start_frame, num_frames, workers=workers,
+                              warmup_frames=int(warmup_seconds * fps), background=background,
+                              motion_filter=motion_filter, scale=tracker_scale, grayscale=grayscale,
+                              search_radius=search_radius, backend=decoder, profiler=profiler,
+                              max_skip=max_skip if adaptive else None)
+        sampling = track["sampling"]
+        frames_tracked = len(track["frames"])
+        frame_height, frame_width = track["frame_shape"] or (None, None)
+        in_center = np.zeros(frames_tracked, dtype=bool)
+        if frames_tracked:
+            zone_map = ZoneMap(frame_width, frame_height, zone_defs)
+            in_center = zone_map.contains("center", track["x"], track["y"])
+        with TrackWriter(output_path, output_format) as writer:
+            writer.write_many(track["frames"], track["x"], track["y"], in_center, track["detected"],
+                              track["skipped"])
+    else:
+        # Decode the video once, seeking straight to the analysis window.
+        frames = stream_frames(video_path, roi=roi, start_frame=start_frame, num_frames=num_frames,
+                               apply_enhancement=crop, output_folder=cropped_frames_folder,
+                               profiler=profiler, backend=decoder, grayscale=grayscale)
+
+        # Tracking results are buffered and written a chunk at a time
+        renderer = None
+        sampler = AdaptiveSampler(max_skip=max_skip) if adaptive else None
+        with TrackWriter(output_path, output_format) as writer:
+            zone_map = None
+            frame_width = frame_height = None
+            frames_tracked = 0
+            for count, (frame_idx, frame) in enumerate(frames):
+                if zone_map is None:
+                    frame_height, frame_width = frame.shape[:2]
+                    zone_map = ZoneMap(frame_width, frame_height, zone_defs)
+                    if render_video:
+                        renderer = AnnotatedVideoWriter(annotated_video_path(output_path), fps,
+                                                        (frame_width, frame_height), zone_map)
+
+                preview = not headless and count % preview_every == 0
+                # The preview draws onto the frame; the renderer needs it untouched.
+                raw_frame = frame.copy() if preview and renderer is not None else frame
+                if sampler is not None:
+                    if profiler is not None:
+                        started = profiler.start()
+                    skipped = not sampler.should_track(frame)
+                    if profiler is not None:
+                        profiler.stop("change_detection", started)
+                else:
+                    skipped = False
+                if skipped:
+                    # Nothing moved: hold the last position without running the tracker.
+                    tracked_frame, coordinate, observed, box = frame, tracker.skip_frame(frame), False, None
+                else:
+                    tracked_frame, keypoints = tracker.track_frame(frame, annotate=preview)
+                    coordinate = keypoints[0] if keypoints else tracker.last_coordinate
+                    observed, box = tracker.detected, tracker.last_box
+                in_center = zone_map.contains_point("center", coordinate)
+                if renderer is not None:
+                    renderer.submit(raw_frame, coordinate, box, observed)
+
+                if profiler is not None:
+                    started = profiler.start()
+                writer.write(frame_idx, coordinate, in_center, observed=observed, skipped=skipped)
+                frames_tracked += 1
+                if profiler is not None:
+                    started = profiler.stop("write", started)
+                    profiler.count("frames")
+                    if skipped:
+                        profiler.count("skipped_frames")
+                    elif not observed:
+                        profiler.count("dropped_detections")
+
+                if preview:
+                    # Display the tracked frame
+                    zone_map.draw(tracked_frame)
+                    cv2.imshow("Tracked Frame", tracked_frame)
+                    key = cv2.waitKey(1) & 0xFF
+                    if profiler is not None:
+                        profiler.stop("display", started)
+                    if key == ord('q'):
+                        break
+
+                if profiler is not None:
+                    profiler.maybe_log()
+            frames.close()
+        if sampler is not None:
+            sampling = sampler.summary()
+        if renderer is not None:
+            renderer.close()
+            render = {"path": renderer.path, "frames_written": renderer.written,
+                      "frames_repeated": renderer.dropped}
+            print(f"Annotated video saved to {renderer.path}")
+
+    # Record what stats need so they never have to reopen the video.
+    save_run_metadata(output_path, _run_metadata(
+        video_path, fps, roi, frame_width, frame_height, start_frame, frames_tracked,
+        center_percent, tracker, output_format, zone_defs, sampling, render))
+    if sampling is not None:
+        print(f"Adaptive sampling: tracked {sampling['tracked_frames']} of {frames_tracked} frames "
+              f"({sampling['skipped_fraction']:.0%} skipped)")
+    if render_video and workers > 1 and frames_tracked:
+        # Rendered from the saved track with a blocking writer, so no frame is repeated.
+        render_track(output_path, video_path, backend=decoder)
+
+    if profiler is not None:
+        profile_path = os.path.splitext(output_path)[0] + "_profile.json"
+        profiler.save(profile_path)
+        print(profiler.progress_line())
+        print(f"Profile saved to {profile_path}")
+
+    if not headless:
+        cv2.destroyAllWindows()
+    print(f"Tracking results saved to {output_path}")
+    return frames_tracked
+
+
+class _Arena:
+    """Tracking state of one arena in a multi-arena video."""
+
+    def __init__(self, roi, output_path, output_format, zone_defs, tracker_options=None):
+        x, y, w, h = roi
+        self.roi = roi
+        self.slices = (slice(y, y + h), slice(x, x + w))
+        tracker_options = tracker_options or {}
+        self.enhancer = RoiEnhancer(**ENHANCEMENT_PARAMS, grayscale=tracker_options.get("grayscale", False))
+        self.tracker = MouseTracker(min_area=500, **tracker_options)
+        self.zone_defs = zone_defs
+        # An arena clipped at the frame border crops smaller than its ROI, so the zones are
+        # laid out over the first actual crop; until then the ROI size stands in for it.
+        self.frame_size = (w, h)
+        self.zone_map = None
+        self.output_path = output_path
+        self.writer = TrackWriter(output_path, output_format)
+        self.coordinate = None
+
+    def process(self, frame_idx, frame):
+        """Crop, enhance and track this arena's region of the full frame."""
+        cropped = self.enhancer(frame[self.slices])
+        if self.zone_map is None:
+            self.frame_size = (cropped.shape[1], cropped.shape[0])
+            self.zone_map = ZoneMap(*self.frame_size, self.zone_defs)
+        _, keypoints = self.tracker.track_frame(cropped, annotate=False)
+        self.coordinate = keypoints[0] if keypoints else self.tracker.last_coordinate
+        in_center = self.zone_map.contains_point("center", self.coordinate)
+        self.writer.write(frame_idx, self.coordinate, in_center, observed=self.tracker.detected)
+
+
+def run_multi_arena(video_path, rois=None, start_time=30, duration=300, center_percent=50,
+                    headless=False, preview_every=1, output_format="csv", threads=False, zones=None,
+                    reselect_rois=False, tracker_scale=1.0, grayscale=False, search_radius=None,
+                    decoder="opencv"):
+    """
+    Track several arenas (cages) seen in one video with a single decode pass. Each decoded
+    frame is cropped to every arena ROI and fed to that arena's own MouseTracker, and each
+    arena gets its own track file, <name>_arena<N>_tracking.<format>.
+
+    Args:
+        video_path (str): Path to the video file.
+        rois (list of tuple): One ROI (x, y, w, h) per arena. When None, the arenas stored
+            for the video are used, or the user is asked to select them.
+        start_time (float): Start of the analysis window in seconds.
+        duration (float): Length of the analysis window in seconds.
+        center_percent (int): Size of the center box as a percentage of each arena.
+        headless (bool): Skip all drawing and display.
+        preview_every (int): When not headless, only show every Nth frame.
+        output_format (str): "csv" or "npy".
+        threads (bool): Track the arenas of each frame in parallel threads.
+        zones (list of dict): Extra zone definitions applied to every arena.
+        reselect_rois (bool): Ask for the arenas again even if some are stored.
+        tracker_scale, grayscale, search_radius: Tracker options, as in run_experiment.
+        decoder (str): Video reader backend, "opencv", "pyav" or "auto" (see videoio.py).
+
+    Returns:
+        frames_tracked (int): Number of frames tracked (per arena).
+    """
+    if preview_every < 1:
+        raise ValueError(f"preview_every must be at least 1, got {preview_every}")
+
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    results_folder = os.path.join("outputs", "results")
+    os.makedirs(results_folder, exist_ok=True)
+
+    fps = get_video_fps(video_path, decoder)
+    if not fps:
+        raise ValueError(f"Failed to extract FPS from video: {video_path}")
+
+    if rois is None:
+        rois = get_or_select_arenas(video_path, reselect=reselect_rois)
+        if not rois:
+            return 0
+
+    zone_defs = [center_zone(center_percent)] + list(zones or [])
+    tracker_options = {"scale": tracker_scale, "grayscale": grayscale, "search_radius": search_radius}
+    arenas = [
+        _Arena(roi, track_path_for(results_folder, f"{video_name}_arena{i + 1}", output_format),
+               output_format, zone_defs, tracker_options)
+        for i, roi in enumerate(rois)
+    ]
+    start_frame = int(start_time * fps)
+    num_frames = int(duration * fps)
+
+    # Decode the full frames once; each arena crops its own region.
+    frames = stream_frames(video_path, start_frame=start_frame, num_frames=num_frames, backend=decoder,
+                           grayscale=grayscale)
+    executor = ThreadPoolExecutor(max_workers=len(arenas)) if threads else None
+    frames_tracked = 0
+    try:
+        for count, (frame_idx, frame) in enumerate(frames):
+            if executor is not None:
+                list(executor.map(lambda arena: arena.process(frame_idx, frame), arenas))
+            else:
+                for arena in arenas:
+                    arena.process(frame_idx, frame)
+            frames_tracked += 1
+
+            if not headless and count % preview_every == 0:
+                for arena in arenas:
+                    x, y, w, h = arena.roi
+                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 255), 2)
+                    if arena.coordinate:
+                        cv2.circle(frame, (x + arena.coordinate[0], y + arena.coordinate[1]),
+                                   5, (0, 0, 255), -1)
+                cv2.imshow("Tracked Arenas", frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+    finally:
+        frames.close()
+        if executor is not None:
+            executor.shutdown()
+        for arena in arenas:
+            arena.writer.close()
+
+    for arena in arenas:
+        save_run_metadata(arena.output_path, _run_metadata(
+            video_path, fps, arena.roi, *arena.frame_size, start_frame, frames_tracked,
+            center_percent, arena.tracker, output_format, zone_defs))
+        print(f"Tracking results saved to {arena.output_path}")
+
+    if not headless:
+        cv2.destroyAllWindows()
+    return frames_tracked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track a mouse in an open-field video.")
+    parser.add_argument("video_path", help="Path to the video file.")
+    parser.add_argument("--no-crop", action="store_true", help="Track the full frame without selecting a ROI.")
+    parser.add_argument("--start-time", type=float, default=30, help="Start time in seconds.")
+    parser.add_argument("--duration", type=float, default=300, help="Duration in seconds.")
+    parser.add_argument("--center-percent", type=int, default=50, help="Center area percentage.")
+    parser.add_argument("--reselect-roi", action="store_true",
+                        help="Select the ROI (or arenas) again even if one is stored for the video.")
+    parser.add_argument("--save-frames", action="store_true", help="Also save the cropped frames as PNGs.")
+    parser.add_argument("--headless", action="store_true", help="Disable all drawing and display.")
+    parser.add_argument("--preview-every", type=int, default=1, help="Only show every Nth frame.")
+    parser.add_argument("--format", choices=["csv", "npy"], default="csv", help="Track output format.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record per-stage timings and save a JSON summary next to the results.")
+    parser.add_argument("--bootstrap-background", action="store_true",
+                        help="Use a cached median background instead of warming up MOG2.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Track the window in this many parallel time chunks (headless).")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Track on frames downscaled by this factor (e.g. 0.5).")
+    parser.add_argument("--grayscale", action="store_true",
+                        help="Decode and track single-channel frames.")
+    parser.add_argument("--search-radius", type=int, default=None,
+                        help="Only search this many pixels around the last detection.")
+    parser.add_argument("--motion-filter", action="store_true",
+                        help="Gate detections with a Kalman filter and predict through misses.")
+    parser.add_argument("--zones", default=None, help="JSON file of extra zone definitions.")
+    parser.add_argument("--decoder", choices=["opencv", "pyav", "auto"], default="opencv",
+                        help="Video reader backend (auto picks the fastest measured on the file).")
+    parser.add_argument("--render-video", action="store_true",
+                        help="Also save an annotated MP4 of the run next to the results.")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Skip tracking on frames where nothing moved (holds the last position).")
+    parser.add_argument("--max-skip", type=int, default=15,
+                        help="Track at least every Nth frame in adaptive mode.")
+    parser.add_argument("--arenas", action="store_true",
+                        help="Track several arenas in the video, one track per arena.")
+    parser.add_argument("--threads", action="store_true", help="Track arenas in parallel threads.")
+    args = parser.parse_args()
+    if args.preview_every < 1:
+        parser.error("--preview-every must be at least 1")
+    zones = load_zones(args.zones) if args.zones else None
+
+    if args.arenas:
+        run_multi_arena(
+            args.video_path,
+            start_time=args.start_time,
+            duration=args.duration,
+            center_percent=args.center_percent,
+            headless=args.headless,
+            preview_every=args.preview_every,
+            output_format=args.format,
+            threads=args.threads,
+            zones=zones,
+            reselect_rois=args.reselect_roi,
+            tracker_scale=args.scale,
+            grayscale=args.grayscale,
+            search_radius=args.search_radius,
+            decoder=args.decoder,
+        )
     else:
-        # If no cropping, assume DataLoader will handle the video directly
-        loader = DataLoader(video_path)
-
-    print(f"Video FPS: {loader.fps}")
-    tracker = MouseTracker(min_area=500)
-    start_frame = int(start_time * loader.fps)
-    num_frames = int(duration * loader.fps)
-
-    # Create and open the CSV file for writing tracking results
-    with open(output_csv, mode="w", newline="") as csvfile:
-        fieldnames = ["frame", "x", "y", "in_center"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for frame_idx in range(start_frame, start_frame + num_frames):
-            frame = loader.get_frame_by_index(frame_idx)
-            box_top_left, box_bottom_right = draw_center_box(frame, percent=center_percent)
-            tracked_frame, keypoints = tracker.track_frame(frame)
-            coordinate = keypoints[0] if keypoints else tracker.last_coordinate
-            in_center = is_inside_box(coordinate, box_top_left, box_bottom_right)
-
-            writer.writerow({
-                "frame": frame_idx,
-                "x": coordinate[0] if coordinate else "",
-                "y": coordinate[1] if coordinate else "",
-                "in_center": in_center
-            })
-
-            # Display the tracked frame
-            cv2.imshow("Tracked Frame", tracked_frame)
-            if cv2.waitKey(30) & 0xFF == ord('q'):
-                break
-
-    cv2.destroyAllWindows()
-    print(f"Tracking results saved to {output_csv}")
\ No newline at end of file
+        run_experiment(
+            args.video_path,
+            crop=not args.no_crop,
+            start_time=args.start_time,
+            duration=args.duration,
+            center_percent=args.center_percent,
+            save_frames=args.save_frames,
+            headless=args.headless,
+            preview_every=args.preview_every,
+            output_format=args.format,
+            profile=args.profile,
+            bootstrap_background=args.bootstrap_background,
+            workers=args.workers,
+            motion_filter=args.motion_filter,
+            zones=zones,
+            decoder=args.decoder,
+            render_video=args.render_video,
+            adaptive=args.adaptive,
+            max_skip=args.max_skip,
+            reselect_roi=args.reselect_roi,
+            tracker_scale=args.scale,
+            grayscale=args.grayscale,
+            search_radius=args.search_radius,
+        )
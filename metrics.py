@@ -0,0 +1,100 @@
+# metrics.py
+import numpy as np
+
+from zones import ZoneMap, center_zone
+
+
+def zone_map_for(roi_width, roi_height, center_percent=50, zones=None):
+    """ZoneMap of the arena: the given zones, plus a center box unless one is already named "center"."""
+    zones = list(zones or [])
+    if not any(zone["name"] == "center" for zone in zones):
+        zones.insert(0, center_zone(center_percent))
+    return ZoneMap(int(roi_width), int(roi_height), zones)
+
+
+def _runs(mask):
+    """Return (starts, lengths) of the runs of True values in a boolean array."""
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.diff(padded)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return starts, ends - starts
+
+
+def compute_metrics(x, y, fps, roi_width, roi_height, center_percent=50,
+                    immobility_speed=20.0, min_immobility_seconds=1.0, speed_bins=20, zones=None):
+    """
+    Compute all track metrics in one vectorized pass over the positions.
+
+    Args:
+        x (numpy.ndarray): X coordinate per frame (NaN where the mouse was never seen).
+        y (numpy.ndarray): Y coordinate per frame.
+        fps (float): Frame rate of the track.
+        roi_width (int): Width of the tracked area in pixels.
+        roi_height (int): Height of the tracked area in pixels.
+        center_percent (int): Side length of the center box as a percentage of the ROI's
+            width and height. Ignored when zones already contain a "center" zone.
+        immobility_speed (float): Speed (pixels/sec) below which the mouse counts as immobile.
+        min_immobility_seconds (float): Shortest still period counted as an immobility bout.
+        speed_bins (int): Number of bins in the speed histogram.
+        zones (list of dict): Zone definitions (see zones.py), e.g. from the run metadata.
+
+    Returns:
+        metrics (dict): Occupancy, distance, speed, immobility and center-entry metrics.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    total_frames = len(x)
+    tracked = ~(np.isnan(x) | np.isnan(y))
+
+    # Zone occupancy: one gather from the zone label image for the whole track.
+    zone_map = zone_map_for(roi_width, roi_height, center_percent, zones)
+    membership = zone_map.membership(x, y)
+    in_center = membership["center"]
+    frames_in_center = int(in_center.sum())
+    frames_in_periphery = int((tracked & ~in_center).sum())
+    zone_dwell_seconds = {name: int(inside.sum()) / fps for name, inside in membership.items()}
+    zone_dwell_seconds["periphery"] = frames_in_periphery / fps
+    zone_dwell_seconds["untracked"] = (total_frames - frames_in_center - frames_in_periphery) / fps
+
+    # Distance and speed from frame-to-frame steps.
+    steps = np.hypot(np.diff(x), np.diff(y))
+    valid_steps = steps[~np.isnan(steps)]
+    speed = valid_steps * fps
+    if speed.size:
+        percentiles = np.percentile(speed, [5, 25, 50, 75, 95])
+        histogram, bin_edges = np.histogram(speed, bins=speed_bins)
+    else:
+        percentiles = np.full(5, np.nan)
+        histogram, bin_edges = np.zeros(speed_bins, dtype=np.int64), np.zeros(speed_bins + 1)
+
+    # Immobility bouts: runs of slow steps lasting at least the minimum duration.
+    still = np.zeros(len(steps), dtype=bool)
+    still[~np.isnan(steps)] = steps[~np.isnan(steps)] * fps < immobility_speed
+    bout_starts, bout_lengths = _runs(still)
+    long_bouts = bout_lengths >= min_immobility_seconds * fps
+    bout_durations = bout_lengths[long_bouts] / fps
+
+    # Center entries: transitions from outside to inside the center box.
+    entries = int(np.count_nonzero(np.diff(in_center.astype(np.int8)) == 1))
+    first_in_center = np.flatnonzero(in_center)
+    latency = float(first_in_center[0] / fps) if first_in_center.size else None
+
+    return {
+        "total_frames": total_frames,
+        "tracked_frames": int(tracked.sum()),
+        "duration_seconds": total_frames / fps,
+        "frames_in_center": frames_in_center,
+        "center_fraction": frames_in_center / total_frames if total_frames else 0.0,
+        "zone_dwell_seconds": zone_dwell_seconds,
+        "total_distance": float(valid_steps.sum()),
+        "mean_speed": float(speed.mean()) if speed.size else float("nan"),
+        "speed_percentiles": dict(zip(["p5", "p25", "p50", "p75", "p95"], percentiles.tolist())),
+        "speed_histogram": {"counts": histogram.tolist(), "bin_edges": bin_edges.tolist()},
+        "immobility_bouts": int(long_bouts.sum()),
+        "immobility_seconds": float(bout_durations.sum()),
+        "immobility_bout_starts": (bout_starts[long_bouts] / fps).tolist(),
+        "center_entries": entries,
+        "center_latency_seconds": latency,
+        "in_center": in_center,
+    }
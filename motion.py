@@ -0,0 +1,103 @@
+# motion.py
+import numpy as np
+
+
+class ConstantVelocityFilter:
+    """
+    Constant-velocity Kalman filter over the mouse centroid, used by MouseTracker to
+    predict where the mouse will be, gate detection candidates by their distance from that
+    prediction, and bridge frames without a detection.
+
+    State is (x, y, vx, vy) in full-resolution pixels, velocities per frame.
+    """
+
+    def __init__(self, process_noise=2.0, measurement_noise=3.0, gate_distance=60.0, max_coast=15,
+                 coast_damping=0.5):
+        """
+        Args:
+            process_noise (float): Standard deviation of the per-frame acceleration (pixels).
+            measurement_noise (float): Standard deviation of a centroid measurement (pixels).
+            gate_distance (float): Base gate radius (pixels); it grows with the uncertainty
+                of the prediction while the mouse is not seen.
+            max_coast (int): Frames to keep predicting without a detection before the track
+                is considered lost and the whole frame is searched again.
+            coast_damping (float): Factor the velocity is multiplied by on every frame without
+                a detection. With background subtraction a miss usually means the mouse
+                stopped, so the estimate should settle rather than keep its last velocity.
+        """
+        self.gate_distance = gate_distance
+        self.max_coast = max_coast
+        self.coast_damping = coast_damping
+        # Last measured position; coasting never takes the estimate further than
+        # gate_distance from it.
+        self.anchor = None
+        self.initialized = False
+        self.misses = 0
+
+        self.F = np.array([[1, 0, 1, 0],
+                           [0, 1, 0, 1],
+                           [0, 0, 1, 0],
+                           [0, 0, 0, 1]], dtype=np.float64)
+        self.H = np.eye(2, 4)
+        q = process_noise ** 2
+        # Discrete white-noise acceleration model.
+        self.Q = q * np.array([[0.25, 0, 0.5, 0],
+                               [0, 0.25, 0, 0.5],
+                               [0.5, 0, 1, 0],
+                               [0, 0.5, 0, 1]], dtype=np.float64)
+        self.R = np.eye(2) * measurement_noise ** 2
+        self.state = np.zeros(4)
+        self.P = np.eye(4)
+
+    @property
+    def lost(self):
+        """Whether the track has coasted too long to trust its prediction."""
+        return not self.initialized or self.misses > self.max_coast
+
+    def reset(self, position):
+        """Start a new track at the given position with zero velocity."""
+        self.state = np.array([position[0], position[1], 0.0, 0.0])
+        self.P = np.diag([self.R[0, 0], self.R[1, 1], 100.0, 100.0])
+        self.anchor = self.state[:2].copy()
+        self.initialized = True
+        self.misses = 0
+
+    def predict(self):
+        """Advance the filter by one frame and return the predicted (x, y)."""
+        self.state = self.F @ self.state
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        return self.state[:2].copy()
+
+    def gate_radius(self):
+        """Radius around the prediction in which detections are accepted."""
+        return self.gate_distance + 3.0 * np.sqrt(max(self.P[0, 0], self.P[1, 1]))
+
+    def gate(self, centroids, predicted):
+        """Boolean mask of the (N, 2) candidate centroids that fall inside the gate."""
+        distance = np.hypot(centroids[:, 0] - predicted[0], centroids[:, 1] - predicted[1])
+        return distance <= self.gate_radius()
+
+    def update(self, measurement):
+        """Correct the prediction with a measured centroid."""
+        innovation = np.asarray(measurement, dtype=np.float64) - self.H @ self.state
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.state = self.state + K @ innovation
+        self.P = (np.eye(4) - K @ self.H) @ self.P
+        self.anchor = np.asarray(measurement, dtype=np.float64).copy()
+        self.misses = 0
+
+    def miss(self):
+        """
+        Record a frame without an accepted detection and return the position that stands in
+        for it: the prediction, with the velocity damped and the distance from the last
+        measurement capped at gate_distance.
+        """
+        self.misses += 1
+        self.state[2:] *= self.coast_damping
+        offset = self.state[:2] - self.anchor
+        distance = np.hypot(offset[0], offset[1])
+        if distance > self.gate_distance:
+            self.state[:2] = self.anchor + offset * (self.gate_distance / distance)
+            self.state[2:] = 0.0
+        return self.state[:2].copy()
@@ -0,0 +1,222 @@
+# render.py
+import argparse
+import os
+import queue
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+from framing import stream_frames
+from trackio import load_run_metadata, load_track, save_run_metadata
+from zones import ZoneMap
+
+RENDER_FOURCC = "mp4v"
+
+
+def annotated_video_path(track_path):
+    """Default path of the annotated video rendered for a track."""
+    return os.path.splitext(track_path)[0] + "_annotated.mp4"
+
+
+def draw_annotations(frame, coordinate, box=None, observed=True, trail=None, zone_map=None):
+    """
+    Draw the zones, the recent trail, the detection's bounding box and the centroid onto
+    a BGR frame. Observed positions get a red dot, held or predicted ones a blue one.
+    """
+    if zone_map is not None:
+        zone_map.draw(frame)
+    if trail is not None and len(trail) > 1:
+        cv2.polylines(frame, [np.array(trail, dtype=np.int32)], False, (255, 255, 0), 1)
+    if box is not None:
+        x, y, w, h = box
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)  # Green box
+    if coordinate is not None:
+        color = (0, 0, 255) if observed else (255, 0, 0)
+        cv2.circle(frame, (int(coordinate[0]), int(coordinate[1])), 5, color, -1)
+    return frame
+
+
+class AnnotatedVideoWriter:
+    """
+    Renders annotated frames to an MP4 file on a writer thread.
+
+    The tracking loop only hands over the frame and its detection; drawing and encoding
+    happen on the writer thread, fed through a bounded queue. When the queue is full the
+    frame is not rendered (and counted in dropped) rather than stalling tracking, unless
+    block is set; the last rendered frame is written again in its place, so the video
+    keeps one frame per tracked frame and stays in sync with the track.
+    A submitted frame must not be modified by the caller afterwards.
+    """
+
+    def __init__(self, path, fps, frame_size, zone_map=None, trail_length=30, queue_size=64,
+                 block=False):
+        """
+        Args:
+            path (str): Output video path.
+            fps (float): Frame rate of the output video.
+            frame_size (tuple): (width, height) of the frames.
+            zone_map (zones.ZoneMap): Zones to outline on every frame.
+            trail_length (int): Number of past positions drawn as a trail (0 disables it).
+            queue_size (int): Maximum number of frames waiting to be rendered.
+            block (bool): Wait for room in the queue instead of dropping frames.
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.zone_map = zone_map
+        self.block = block
+        self.dropped = 0
+        self.written = 0
+        self._trail = deque(maxlen=trail_length) if trail_length else None
+        # Frames dropped since the last queued one; the writer repeats a frame for each.
+        self._repeats = 0
+        self._last_frame = None
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*RENDER_FOURCC), fps,
+                                       tuple(int(v) for v in frame_size))
+        if not self._writer.isOpened():
+            raise ValueError(f"Could not open video writer for {path}")
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, coordinate, box=None, observed=True):
+        """Queue a frame for rendering. Returns False if it was dropped (and will be repeated)."""
+        item = (frame, coordinate, box, observed, self._repeats)
+        if self.block:
+            self._queue.put(item)
+            self._repeats = 0
+            return True
+        try:
+            self._queue.put_nowait(item)
+            self._repeats = 0
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self._repeats += 1
+            return False
+
+    def _write_repeats(self, repeats, fallback):
+        """Write the last rendered frame (or fallback) once per dropped frame."""
+        frame = self._last_frame if self._last_frame is not None else fallback
+        if frame is None:
+            return
+        for _ in range(repeats):
+            self._writer.write(frame)
+        self.written += repeats
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue
+            frame, coordinate, box, observed, repeats = item
+            try:
+                if frame is None:
+                    self._write_repeats(repeats, None)
+                    continue
+                if frame.ndim == 2:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+                if self._trail is not None and coordinate is not None:
+                    self._trail.append(coordinate)
+                draw_annotations(frame, coordinate, box, observed, self._trail, self.zone_map)
+                if repeats:
+                    self._write_repeats(repeats, frame)
+                self._writer.write(frame)
+                self._last_frame = frame
+                self.written += 1
+            except Exception as e:
+                # Keep draining so the tracking loop never blocks on a dead writer.
+                self._error = e
+
+    def close(self):
+        """Render the queued frames, then finalize the file."""
+        if self._thread is None:
+            return
+        if self._repeats:
+            # Frames dropped after the last queued one.
+            self._queue.put((None, None, None, None, self._repeats))
+            self._repeats = 0
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._writer.release()
+        if self.dropped:
+            print(f"Warning: annotated video repeated the previous frame for {self.dropped} frame(s) "
+                  "to keep up with tracking.")
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def render_track(track_path, video_path=None, output_path=None, trail_length=30, backend="opencv"):
+    """
+    Re-render the annotated video of a saved track from the source video, without running
+    the tracker again. The saved track has no bounding boxes, so only the zones, trail and
+    centroid are drawn. The frames are read the way the run read them (same ROI, grayscale
+    setting), and the rendered video is recorded in the run metadata.
+
+    Args:
+        track_path (str): Track file (.csv or .npy) with its run metadata sidecar.
+        video_path (str): Source video (default: the one recorded in the metadata).
+        output_path (str): Output video (default: <track>_annotated.mp4).
+        trail_length (int): Number of past positions drawn as a trail.
+        backend (str): Video reader backend (see videoio.open_video).
+
+    Returns:
+        output_path (str): Path of the rendered video.
+    """
+    metadata = load_run_metadata(track_path)
+    if metadata is None:
+        raise ValueError(f"No run metadata for {track_path}; it is needed to re-render the video.")
+    video_path = video_path or metadata["video_path"]
+    output_path = output_path or annotated_video_path(track_path)
+
+    track = load_track(track_path)
+    if len(track) == 0:
+        raise ValueError(f"{track_path} is empty.")
+    roi = tuple(metadata["roi"]) if metadata.get("roi") else None
+    zones = metadata.get("zones")
+    zone_map = ZoneMap(metadata["frame_width"], metadata["frame_height"], zones) if zones else None
+    rows = {int(frame): i for i, frame in enumerate(track["frame"])}
+    first, last = int(track["frame"][0]), int(track["frame"][-1])
+
+    grayscale = metadata.get("tracker", {}).get("grayscale", False)
+    frames = stream_frames(video_path, roi=roi, start_frame=first, num_frames=last - first + 1,
+                           apply_enhancement=roi is not None, backend=backend, grayscale=grayscale)
+    with AnnotatedVideoWriter(output_path, metadata["fps"],
+                              (metadata["frame_width"], metadata["frame_height"]),
+                              zone_map=zone_map, trail_length=trail_length, block=True) as writer:
+        for frame_idx, frame in frames:
+            row = rows.get(frame_idx)
+            if row is None:
+                continue
+            x, y = int(track["x"][row]), int(track["y"][row])
+            coordinate = (x, y) if x >= 0 and y >= 0 else None
+            writer.submit(frame, coordinate, observed=bool(track["observed"][row]))
+    metadata["render"] = {"path": output_path, "frames_written": writer.written,
+                          "frames_repeated": writer.dropped}
+    save_run_metadata(track_path, metadata)
+    print(f"Annotated video saved to {output_path}")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the annotated video of a saved track.")
+    parser.add_argument("track_path", help="Track file (.csv or .npy).")
+    parser.add_argument("--video", default=None, help="Source video (default: from the run metadata).")
+    parser.add_argument("--output", default=None, help="Output MP4 (default: <track>_annotated.mp4).")
+    parser.add_argument("--trail", type=int, default=30, help="Trail length in frames (0 disables it).")
+    args = parser.parse_args()
+
+    render_track(args.track_path, args.video, args.output, args.trail)
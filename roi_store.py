@@ -0,0 +1,124 @@
+# roi_store.py
+import hashlib
+import json
+import os
+
+# Project-level file holding the ROI selected for every video.
+ROI_STORE_PATH = os.path.join("outputs", "rois.json")
+
+# Bytes read from the start and the end of a video to fingerprint it.
+HASH_CHUNK_SIZE = 1 << 20
+
+_hash_cache = {}
+
+
+def video_hash(video_path):
+    """
+    Fingerprint a video by its size and its first and last megabyte.
+
+    Reading the whole of a multi-gigabyte recording would take longer than cropping it,
+    and the container header plus the tail are enough to tell recordings apart.
+    """
+    stat = os.stat(video_path)
+    cache_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime)
+    if cache_key in _hash_cache:
+        return _hash_cache[cache_key]
+
+    digest = hashlib.sha1(str(stat.st_size).encode())
+    with open(video_path, "rb") as f:
+        digest.update(f.read(HASH_CHUNK_SIZE))
+        if stat.st_size > HASH_CHUNK_SIZE:
+            f.seek(max(HASH_CHUNK_SIZE, stat.st_size - HASH_CHUNK_SIZE))
+            digest.update(f.read(HASH_CHUNK_SIZE))
+    _hash_cache[cache_key] = digest.hexdigest()
+    return _hash_cache[cache_key]
+
+
+def load_store(store_path=ROI_STORE_PATH):
+    """Load the ROI store, returning an empty one if it doesn't exist yet."""
+    if not os.path.exists(store_path):
+        return {}
+    with open(store_path) as f:
+        return json.load(f)
+
+
+def save_store(store, store_path=ROI_STORE_PATH):
+    """Write the ROI store atomically so an interrupted run can't corrupt it."""
+    folder = os.path.dirname(store_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = store_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(store, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, store_path)
+
+
+def _has_area(roi):
+    """Whether a stored ROI is non-empty (a cancelled selection is stored as zeros)."""
+    return bool(roi) and roi[2] > 0 and roi[3] > 0
+
+
+def get_roi(video_path, store_path=ROI_STORE_PATH):
+    """
+    Look up the stored ROI of a video.
+
+    Entries are keyed by path and checked against the content hash, so a re-encoded file
+    at the same path is not given a stale ROI. A video that was moved or renamed is found
+    by its hash.
+
+    Returns:
+        roi (tuple): Region of interest (x, y, w, h), or None if no ROI is stored.
+    """
+    store = load_store(store_path)
+    if not store:
+        return None
+    content_hash = video_hash(video_path)
+    entry = store.get(os.path.abspath(video_path))
+    if entry is not None and entry["hash"] == content_hash and _has_area(entry.get("roi")):
+        return tuple(entry["roi"])
+    for entry in store.values():
+        if entry["hash"] == content_hash and _has_area(entry.get("roi")):
+            return tuple(entry["roi"])
+    return None
+
+
+def get_arena_rois(video_path, store_path=ROI_STORE_PATH):
+    """
+    Look up the stored arena ROIs of a video showing several cages.
+
+    Returns:
+        rois (list of tuple): One (x, y, w, h) per arena, or None if none are stored.
+    """
+    content_hash = video_hash(video_path)
+    store = load_store(store_path)
+    entry = store.get(os.path.abspath(video_path))
+    candidates = [entry] if entry is not None else []
+    candidates += list(store.values())
+    for entry in candidates:
+        if entry["hash"] == content_hash and entry.get("arenas"):
+            return [tuple(roi) for roi in entry["arenas"]]
+    return None
+
+
+def save_arena_rois(video_path, rois, store_path=ROI_STORE_PATH):
+    """Store one ROI (x, y, w, h) per arena for a video showing several cages."""
+    store = load_store(store_path)
+    key = os.path.abspath(video_path)
+    entry = store.get(key, {})
+    entry["hash"] = video_hash(video_path)
+    entry["arenas"] = [[int(v) for v in roi] for roi in rois]
+    store[key] = entry
+    save_store(store, store_path)
+
+
+def save_roi(video_path, roi, store_path=ROI_STORE_PATH):
+    """Store the ROI (x, y, w, h) of a video."""
+    if not _has_area(roi):
+        raise ValueError(f"Refusing to store an empty ROI for {video_path}: {roi}")
+    store = load_store(store_path)
+    key = os.path.abspath(video_path)
+    entry = store.get(key, {})
+    entry["hash"] = video_hash(video_path)
+    entry["roi"] = [int(v) for v in roi]
+    store[key] = entry
+    save_store(store, store_path)
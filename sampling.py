@@ -0,0 +1,92 @@
+# sampling.py
+import cv2
+
+
+class ChangeDetector:
+    """
+    Cheap frame-change check for adaptive sampling. Frames are shrunk to a small grey
+    thumbnail (area averaging also smooths out sensor noise) and compared with the
+    thumbnail of the last frame that was fully tracked, so slow drift still adds up.
+    """
+
+    def __init__(self, downscale=8, pixel_threshold=15, min_changed_pixels=2):
+        """
+        :param downscale: Thumbnail is 1/downscale of the frame in each dimension.
+        :param pixel_threshold: Grey-level difference at which a thumbnail pixel counts as changed.
+        :param min_changed_pixels: Changed thumbnail pixels needed to call the frame changed.
+        """
+        self.downscale = downscale
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_pixels = min_changed_pixels
+        self.reference = None
+        # Changed thumbnail pixels of the last checked frame.
+        self.score = 0
+        self._thumbnail = None
+        self._diff = None
+
+    def _make_thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        size = (max(1, width // self.downscale), max(1, height // self.downscale))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def changed(self, frame):
+        """Whether the frame differs enough from the reference to be worth tracking."""
+        self._thumbnail = self._make_thumbnail(frame)
+        if self.reference is None or self.reference.shape != self._thumbnail.shape:
+            self.score = self._thumbnail.size
+            return True
+        self._diff = cv2.absdiff(self._thumbnail, self.reference, dst=self._diff)
+        _, mask = cv2.threshold(self._diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        self.score = cv2.countNonZero(mask)
+        return self.score >= self.min_changed_pixels
+
+    def set_reference(self):
+        """Make the last checked frame the reference for the following ones."""
+        self.reference = self._thumbnail
+
+
+class AdaptiveSampler:
+    """
+    Decides per frame whether to run the full tracker: only when the change detector sees
+    motion since the last tracked frame, and at least every max_skip frames regardless.
+    Skipped frames keep the held position.
+    """
+
+    def __init__(self, detector=None, max_skip=15):
+        """
+        :param detector: ChangeDetector to use (default settings when None).
+        :param max_skip: Longest run of skipped frames before a frame is tracked anyway.
+        """
+        self.detector = detector or ChangeDetector()
+        self.max_skip = max_skip
+        self.tracked = 0
+        self.skipped = 0
+        self._since_tracked = 0
+
+    def should_track(self, frame):
+        """Check a frame; True means run the tracker on it."""
+        track = self._since_tracked >= self.max_skip or self.detector.changed(frame)
+        if track:
+            if self._since_tracked >= self.max_skip:
+                # Forced frame: the thumbnail wasn't computed yet.
+                self.detector.changed(frame)
+            self.detector.set_reference()
+            self._since_tracked = 0
+            self.tracked += 1
+        else:
+            self._since_tracked += 1
+            self.skipped += 1
+        return track
+
+    def summary(self):
+        """Tracked and skipped frame counts (each skipped frame is one tracker call saved)."""
+        total = self.tracked + self.skipped
+        return {
+            "tracked_frames": self.tracked,
+            "skipped_frames": self.skipped,
+            "skipped_fraction": self.skipped / total if total else 0.0,
+            "max_skip": self.max_skip,
+        }
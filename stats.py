@@ -1,44 +1,66 @@
-import pandas as pd
+import argparse
+
 import numpy as np
-import matplotlib.pyplot as plt
-import os
-import cv2
-from dataloader import DataLoader  # Ensure this is implemented correctly
 
+from trackio import load_run_metadata, load_track, track_xy
+
+# pandas, matplotlib and the metrics/zones stack are imported when an analysis runs, so
+# importing this module (e.g. from the command-line entry point) stays cheap.
+
+
+def _frame_info_from_video(video_path, cropped_folder):
+    """Fallback for tracks without run metadata: read FPS and ROI size from the media."""
+    from dataloader import DataLoader
+    with DataLoader(video_path, cropped_folder) as loader:
+        width, height = loader.get_frame_dimensions()
+        return loader.fps, width, height
 
-def compute_center_box(roi_width, roi_height, center_percent):
-    """Compute the center box coordinates given a percentage."""
-    box_w = roi_width * center_percent / 100
-    box_h = roi_height * center_percent / 100
-    top_left_x = (roi_width - box_w) / 2
-    top_left_y = (roi_height - box_h) / 2
-    bottom_right_x = top_left_x + box_w
-    bottom_right_y = top_left_y + box_h
-    return top_left_x, top_left_y, bottom_right_x, bottom_right_y
 
+def analyze_tracking_data(csv_file, video_path=None, cropped_folder=None, center_percent=None,
+                          show=True, figure_path=None):
+    """
+    Analyzes mouse tracking results and generates statistics/plots.
 
-def analyze_tracking_data(csv_file, video_path, cropped_folder, center_percent=50):
-    """Analyzes mouse tracking results and generates statistics/plots."""
+    FPS and ROI size come from the run metadata saved next to the CSV; the video (and
+    cropped frames folder) is only opened for older results without metadata.
 
-    # Load tracking data
-    df = pd.read_csv(csv_file)
+    The zones are the ones saved with the run. An explicit center_percent replaces the
+    run's center zone; None keeps it (or uses a 50% center box without metadata).
 
-    # Load video data using DataLoader
-    loader = DataLoader(video_path, cropped_folder)
-    fps = loader.fps
-    roi_width, roi_height = loader.get_frame_dimensions()
+    The plot is shown when show is set and saved to figure_path when one is given.
+    """
+    import pandas as pd
+    import matplotlib
+    if not show:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from analysis import resolve_params
+    from metrics import compute_metrics
 
-    # Compute center box coordinates
-    top_left_x, top_left_y, bottom_right_x, bottom_right_y = compute_center_box(roi_width, roi_height, center_percent)
+    # Load tracking data (CSV or binary track)
+    track = load_track(csv_file)
+    x, y = track_xy(track)
+    df = pd.DataFrame({"frame": track["frame"], "x": x, "y": y})
+
+    metadata = load_run_metadata(csv_file)
+    if metadata is not None:
+        fps = metadata["fps"]
+        roi_width, roi_height = metadata["frame_width"], metadata["frame_height"]
+    elif video_path is not None:
+        fps, roi_width, roi_height = _frame_info_from_video(video_path, cropped_folder)
+    else:
+        raise ValueError(f"No run metadata for {csv_file}; pass video_path to read it from the video.")
+
+    # Same parameter resolution as analysis.py, so both report the same zones.
+    params = resolve_params(metadata, center_percent=center_percent)
+    metrics = compute_metrics(x, y, fps, roi_width, roi_height, **params)
 
     # Recompute 'in_center' in case we need verification
-    df["in_center"] = df.apply(lambda row:
-                               top_left_x <= row["x"] <= bottom_right_x and top_left_y <= row["y"] <= bottom_right_y,
-                               axis=1)
+    df["in_center"] = metrics["in_center"]
 
     # Compute statistics
-    total_frames = len(df)
-    frames_in_center = df["in_center"].sum()
+    total_frames = metrics["total_frames"]
+    frames_in_center = metrics["frames_in_center"]
     frames_out = total_frames - frames_in_center
     time_in_center = frames_in_center / fps
     time_out = frames_out / fps
@@ -48,6 +70,17 @@ def analyze_tracking_data(csv_file, video_path, cropped_folder, center_percent=5
     print(f"Frames out of center: {frames_out} ({frames_out / total_frames * 100:.2f}%)")
     print(f"Time in center: {time_in_center:.2f} seconds")
     print(f"Time outside center: {time_out:.2f} seconds")
+    for name, seconds in metrics["zone_dwell_seconds"].items():
+        if name not in ("center", "periphery", "untracked"):
+            print(f"Time in {name}: {seconds:.2f} seconds")
+    print(f"Center entries: {metrics['center_entries']}")
+    if metrics["center_latency_seconds"] is not None:
+        print(f"Latency to first center entry: {metrics['center_latency_seconds']:.2f} seconds")
+    print(f"Total distance travelled: {metrics['total_distance']:.1f} pixels")
+    print(f"Mean speed: {metrics['mean_speed']:.1f} pixels/second "
+          f"(median {metrics['speed_percentiles']['p50']:.1f})")
+    print(f"Immobility: {metrics['immobility_bouts']} bouts, "
+          f"{metrics['immobility_seconds']:.2f} seconds")
 
     # Compute distance from ROI center
     roi_center_x = roi_width / 2
@@ -61,14 +94,28 @@ def analyze_tracking_data(csv_file, video_path, cropped_folder, center_percent=5
     plt.ylabel("Distance from Center (pixels)")
     plt.title("Mouse Distance from Center Over Time")
     plt.legend()
-    plt.show()
+    if figure_path is not None:
+        plt.savefig(figure_path)
+        print(f"Figure saved to {figure_path}")
+    if show:
+        plt.show()
+    else:
+        plt.close()
+
+    return metrics
 
 
 if __name__ == "__main__":
-    analyze_tracking_data(
-        csv_file="tracking_results.csv",
-        video_path="061224/cage 183/xage183.mp4",
-        cropped_folder="cropped_frames",
-        center_percent=50  # Modify as needed
-    )
+    parser = argparse.ArgumentParser(description="Print statistics and plot a tracking result.")
+    parser.add_argument("track_path", help="Track file (.csv or .npy).")
+    parser.add_argument("--video", default=None,
+                        help="Source video, only needed for results without run metadata.")
+    parser.add_argument("--cropped-folder", default=None, help="Cropped frames folder of the video.")
+    parser.add_argument("--center-percent", type=int, default=None,
+                        help="Center area percentage (default: the one the run was recorded with).")
+    parser.add_argument("--no-show", action="store_true", help="Don't open the plot window.")
+    parser.add_argument("--figure", default=None, help="Save the plot to this file.")
+    args = parser.parse_args()
 
+    analyze_tracking_data(args.track_path, args.video, args.cropped_folder, args.center_percent,
+                          show=not args.no_show, figure_path=args.figure)
@@ -96,11 +96,33 @@ import cv2
 import numpy as np
 
 class MouseTracker:
-    def __init__(self, min_area=500):
+    def __init__(self, min_area=500, scale=1.0, grayscale=False, search_radius=None,
+                 search_max_misses=5, background=None, diff_threshold=25, motion_filter=None,
+                 filter_warmup_frames=30):
         """
         Motion-based mouse tracker using background subtraction.
 
-        :param min_area: Minimum contour area to be considered valid motion.
+        :param min_area: Minimum contour area (in full-resolution pixels) to be considered valid motion.
+        :param scale: Processing scale; frames are downscaled by this factor before background
+                      subtraction and centroids are mapped back to full-resolution coordinates.
+        :param grayscale: Run background subtraction on a single luminance channel.
+        :param search_radius: Half-size (in full-resolution pixels) of a window around the last
+                              detection that morphology and contour analysis are limited to.
+                              None analyses the whole frame.
+        :param search_max_misses: Only use the search window if the mouse was detected within
+                                  this many frames; otherwise search the whole frame.
+        :param background: Static background image (see background.get_background). When given,
+                           the foreground is found by frame-minus-background differencing
+                           instead of MOG2, which needs no warm-up and can start at any frame.
+        :param diff_threshold: Minimum absolute difference from the background counted as foreground.
+        :param motion_filter: Optional motion model (e.g. motion.ConstantVelocityFilter). Candidates
+                              are then gated by distance from its prediction, the search is limited
+                              to a window around the prediction, and frames without an accepted
+                              detection get the predicted position instead of a frozen one.
+        :param filter_warmup_frames: Frames the MOG2 model gets to settle before a detection may
+                                     start the motion filter's track; blobs from a model that
+                                     is still warming up would give it a bogus velocity.
+                                     Not needed with a static background.
         """
         # Background subtractor (increased sensitivity)
         self.bg_subtractor = cv2.createBackgroundSubtractorMOG2(
@@ -109,23 +131,81 @@ class MouseTracker:
         self.min_area = min_area
         self.last_coordinate = None
 
-    def track_frame(self, frame):
-        """
-        Process a single frame to detect motion.
+        self.scale = scale
+        self.grayscale = grayscale
+        self.search_radius = search_radius
+        self.search_max_misses = search_max_misses
+        self._frames_since_seen = None
+        # Whether the last tracked frame had an actual detection (not a held position).
+        self.detected = False
+        # Bounding box (x, y, w, h) of that detection in full-resolution pixels, else None.
+        self.last_box = None
+        # Optional instrumentation.StageProfiler timing the tracker's internal stages.
+        self.profiler = None
 
-        :param frame: The current video frame.
-        :return: Tuple of (annotated frame, list containing a single keypoint tuple)
-        """
-        # Apply background subtractor
-        fg_mask = self.bg_subtractor.apply(frame)
+        # Scale the morphology kernel and area threshold with the processing resolution.
+        kernel_size = max(3, int(round(5 * scale)) | 1)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
+        self.scaled_min_area = min_area * scale * scale
+
+        # The background goes through the same preprocessing as every frame.
+        self.diff_threshold = diff_threshold
+        self.background = self._preprocess(background) if background is not None else None
+
+        self.motion_filter = motion_filter
+        self.filter_warmup_frames = 0 if self.background is not None else filter_warmup_frames
+        self._frames_processed = 0
+        # Frames the MOG2 model has accounted for, including skipped ones, and the last
+        # skipped frame (preprocessed) with the number of skipped frames it stands in for.
+        self._model_frames = 0
+        self._held_frame = None
+        self._held_count = 0
 
-        # Threshold mask to remove noise
-        _, fg_mask = cv2.threshold(fg_mask, 200, 255, cv2.THRESH_BINARY)
+    def _preprocess(self, frame):
+        """Convert the frame to the tracker's processing colour space and resolution."""
+        if self.grayscale and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return frame
 
-        # Morphological operations to clean up small noise
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel, iterations=2)
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel, iterations=2)
+    def _to_full_resolution(self, value):
+        """Map a processing-resolution pixel coordinate back to the full-resolution frame."""
+        if self.scale == 1.0:
+            return value
+        # Pixel centres sit at half-pixel offsets, so map centre to centre.
+        return (value + 0.5) / self.scale - 0.5
+
+    def _search_window(self, shape):
+        """Return (x0, y0, x1, y1) of the search window in processing coordinates, or None."""
+        if (self.search_radius is None or self.last_coordinate is None
+                or self._frames_since_seen is None
+                or self._frames_since_seen > self.search_max_misses):
+            return None
+        height, width = shape[:2]
+        radius = int(self.search_radius * self.scale)
+        cx = int(self.last_coordinate[0] * self.scale)
+        cy = int(self.last_coordinate[1] * self.scale)
+        return max(0, cx - radius), max(0, cy - radius), min(width, cx + radius), min(height, cy + radius)
+
+    def _clean_mask(self, fg_mask):
+        """Morphological operations to clean up small noise."""
+        profiler = self.profiler
+        if profiler is not None:
+            started = profiler.start()
+        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, self.kernel, iterations=2)
+        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, self.kernel, iterations=2)
+        if profiler is not None:
+            profiler.stop("morphology", started)
+        return fg_mask
+
+    def _largest_contour(self, fg_mask):
+        """Clean up the mask and return its largest contour above the area threshold."""
+        fg_mask = self._clean_mask(fg_mask)
+
+        profiler = self.profiler
+        if profiler is not None:
+            started = profiler.start()
 
         # Find contours in the mask
         contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -136,31 +216,216 @@ class MouseTracker:
 
         for cnt in contours:
             area = cv2.contourArea(cnt)
-            if area > self.min_area and area > largest_area:
+            if area > self.scaled_min_area and area > largest_area:
                 largest_area = area
                 largest_contour = cnt
+        if profiler is not None:
+            profiler.stop("find_contours", started)
+        return largest_contour
+
+    def track_frame(self, frame, annotate=True):
+        """
+        Process a single frame to detect motion.
+
+        :param frame: The current video frame.
+        :param annotate: Draw the bounding box and centroid onto the frame. Disable for
+                         headless runs where the frame is never displayed.
+        :return: Tuple of (annotated frame, list containing a single keypoint tuple)
+        """
+        self._frames_processed += 1
+        profiler = self.profiler
+        if profiler is not None:
+            started = profiler.start()
+
+        if self.background is not None:
+            # Difference against the static background; a pixel is foreground if any
+            # channel changed enough.
+            diff = cv2.absdiff(self._preprocess(frame), self.background)
+            if diff.ndim == 3:
+                diff = diff.max(axis=2)
+            _, fg_mask = cv2.threshold(diff, self.diff_threshold, 255, cv2.THRESH_BINARY)
+        else:
+            # Apply background subtractor
+            if self._held_count:
+                self._learn_held_frames()
+            self._model_frames += 1
+            fg_mask = self.bg_subtractor.apply(self._preprocess(frame),
+                                               learningRate=self._learning_rate(self._model_frames))
+
+            # Threshold mask to remove noise
+            _, fg_mask = cv2.threshold(fg_mask, 200, 255, cv2.THRESH_BINARY)
+        if profiler is not None:
+            profiler.stop("background_subtraction", started)
+
+        if self.motion_filter is not None:
+            return self._track_with_filter(frame, fg_mask, annotate)
+
+        # Limit contour analysis to the area around the last detection when it is recent.
+        largest_contour = None
+        offset_x, offset_y = 0, 0
+        window = self._search_window(fg_mask.shape)
+        if window is not None:
+            x0, y0, x1, y1 = window
+            largest_contour = self._largest_contour(fg_mask[y0:y1, x0:x1])
+            offset_x, offset_y = x0, y0
+        if largest_contour is None:
+            offset_x, offset_y = 0, 0
+            largest_contour = self._largest_contour(fg_mask)
 
         keypoints = []
+        detected = False
 
         if largest_contour is not None:
-            # Compute centroid
+            # Compute centroid, mapped back to full-resolution coordinates
             M = cv2.moments(largest_contour)
             if M["m00"] != 0:
-                cX = int(M["m10"] / M["m00"])
-                cY = int(M["m01"] / M["m00"])
+                cX = int(self._to_full_resolution(M["m10"] / M["m00"] + offset_x))
+                cY = int(self._to_full_resolution(M["m01"] / M["m00"] + offset_y))
                 self.last_coordinate = (cX, cY)
-
-                # Draw bounding box
+                self._frames_since_seen = 0
+                detected = True
                 x, y, w, h = cv2.boundingRect(largest_contour)
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)  # Green box
-                cv2.circle(frame, (cX, cY), 5, (0, 0, 255), -1)  # Red dot at center
+                x, y = int((x + offset_x) / self.scale), int((y + offset_y) / self.scale)
+                w, h = int(w / self.scale), int(h / self.scale)
+                self.last_box = (x, y, w, h)
+
+                if annotate:
+                    # Draw bounding box
+                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)  # Green box
+                    cv2.circle(frame, (cX, cY), 5, (0, 0, 255), -1)  # Red dot at center
 
                 keypoints.append((cX, cY))
 
         elif self.last_coordinate is not None:
             # If no motion, retain last known position
             keypoints.append(self.last_coordinate)
-            cv2.circle(frame, self.last_coordinate, 5, (255, 0, 0), -1)  # Blue marker
+            if annotate:
+                cv2.circle(frame, self.last_coordinate, 5, (255, 0, 0), -1)  # Blue marker
+
+        if self._frames_since_seen is not None and not detected:
+            self._frames_since_seen += 1
+        if not detected:
+            self.last_box = None
+        self.detected = detected
+        return frame, keypoints
+
+    def _learning_rate(self, frame_count):
+        """MOG2's own default learning rate for the frame_count-th frame of its model."""
+        return 1.0 / min(2 * max(frame_count, 1), self.bg_subtractor.getHistory())
+
+    def _learn_held_frames(self):
+        """
+        Update the MOG2 model with the frames skipped since the last tracked one. They are
+        all alike (that is why they were skipped), so the last one is learned once with the
+        combined weight the model would have given all of them, at the cost of one update.
+        """
+        keep = 1.0
+        for _ in range(self._held_count):
+            self._model_frames += 1
+            keep *= 1.0 - self._learning_rate(self._model_frames)
+        self.bg_subtractor.apply(self._held_frame, learningRate=1.0 - keep)
+        self._held_frame = None
+        self._held_count = 0
+
+    def skip_frame(self, frame=None):
+        """
+        Account for a frame the tracker is not run on because nothing changed in it
+        (adaptive sampling). The position is held; a motion filter is still advanced by one
+        frame and corrected with the held position, so its state keeps pace with the video
+        and its velocity settles towards zero.
+
+        With MOG2, the skipped frames still have to reach the background model, or it goes
+        stale over a long pause and the first tracked frames afterwards pick up spurious
+        blobs. The last skipped frame is kept and learned, weighted for every skipped frame,
+        right before the next tracked one.
+
+        :param frame: The skipped frame (needed to keep a MOG2 model up to date).
+        :return: The held coordinate (None if the mouse has not been seen yet).
+        """
+        if frame is not None and self.background is None:
+            held = self._preprocess(frame)
+            # The caller may reuse the frame buffer.
+            self._held_frame = held.copy() if held is frame else held
+            self._held_count += 1
+        motion_filter = self.motion_filter
+        if motion_filter is not None and not motion_filter.lost and self.last_coordinate is not None:
+            motion_filter.predict()
+            motion_filter.update(self.last_coordinate)
+        self.detected = False
+        self.last_box = None
+        return self.last_coordinate
+
+    def _track_with_filter(self, frame, fg_mask, annotate):
+        """
+        Detection step when a motion filter is set. Candidate blobs come from
+        connectedComponentsWithStats as arrays, so area and gate checks are NumPy
+        operations rather than a loop over contours.
+        """
+        motion_filter = self.motion_filter
+        height, width = fg_mask.shape[:2]
+
+        # Search a window around the prediction while the track is alive.
+        predicted = None
+        x0, y0, x1, y1 = 0, 0, width, height
+        if not motion_filter.lost:
+            predicted = motion_filter.predict()
+            radius = motion_filter.gate_radius() * self.scale
+            px, py = predicted * self.scale
+            x0, y0 = max(0, int(px - radius)), max(0, int(py - radius))
+            x1, y1 = min(width, int(px + radius) + 1), min(height, int(py + radius) + 1)
+
+        cleaned = self._clean_mask(fg_mask[y0:y1, x0:x1]) if x1 > x0 and y1 > y0 else None
+
+        profiler = self.profiler
+        if profiler is not None:
+            started = profiler.start()
+        accepted = None
+        if cleaned is not None:
+            _, _, stats, centroids = cv2.connectedComponentsWithStats(cleaned, connectivity=8)
+            # Label 0 is the background.
+            stats, centroids = stats[1:], centroids[1:]
+            areas = stats[:, cv2.CC_STAT_AREA]
+            centroids = self._to_full_resolution(centroids + (x0, y0))
+            valid = areas > self.scaled_min_area
+            if predicted is not None:
+                valid &= motion_filter.gate(centroids, predicted)
+            if valid.any():
+                accepted = int(np.argmax(np.where(valid, areas, -1)))
+        if profiler is not None:
+            profiler.stop("connected_components", started)
+
+        keypoints = []
+        if accepted is not None:
+            measurement = centroids[accepted]
+            if not motion_filter.lost:
+                motion_filter.update(measurement)
+            elif self._frames_processed > self.filter_warmup_frames:
+                motion_filter.reset(measurement)
+            cX, cY = int(measurement[0]), int(measurement[1])
+            self.last_coordinate = (cX, cY)
+            self.detected = True
+            keypoints.append((cX, cY))
+            x, y, w, h = stats[accepted, :4]
+            x, y = int((x + x0) / self.scale), int((y + y0) / self.scale)
+            w, h = int(w / self.scale), int(h / self.scale)
+            self.last_box = (x, y, w, h)
+
+            if annotate:
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)  # Green box
+                cv2.circle(frame, (cX, cY), 5, (0, 0, 255), -1)  # Red dot at center
+        else:
+            self.detected = False
+            self.last_box = None
+            if predicted is not None:
+                # Coast on the damped prediction, kept inside the frame.
+                coasted = motion_filter.miss()
+                frame_height, frame_width = frame.shape[:2]
+                keypoints.append((int(np.clip(coasted[0], 0, frame_width - 1)),
+                                  int(np.clip(coasted[1], 0, frame_height - 1))))
+            elif self.last_coordinate is not None:
+                keypoints.append(self.last_coordinate)
+            if annotate and keypoints:
+                cv2.circle(frame, keypoints[0], 5, (255, 0, 0), -1)  # Blue marker
 
         return frame, keypoints
 
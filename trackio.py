@@ -0,0 +1,239 @@
+# trackio.py
+import json
+import os
+
+import numpy as np
+
+# One record per tracked frame. Coordinates are cropped-frame pixels, -1 where the mouse
+# has not been seen yet. Frame indices need 32 bits: an hour at 30 fps is over 100k frames.
+# "observed" is 0 where the position was held or predicted rather than detected.
+# "skipped" is 1 where adaptive sampling didn't run the tracker and the position was held.
+TRACK_DTYPE = np.dtype([
+    ("frame", "<i4"),
+    ("x", "<i2"),
+    ("y", "<i2"),
+    ("in_center", "u1"),
+    ("observed", "u1"),
+    ("skipped", "u1"),
+])
+
+CSV_HEADER = "frame,x,y,in_center,observed,skipped\n"
+
+TRACK_FORMATS = ("csv", "npy")
+
+
+def metadata_path(track_path):
+    """
+    Path of the run metadata sidecar written next to a track file. It keeps the track's
+    extension (video_tracking.csv.json), so the csv and npy tracks of a video don't
+    overwrite each other's metadata.
+    """
+    return track_path + ".json"
+
+
+def _legacy_metadata_path(track_path):
+    """Sidecar path used before the track format was part of it (video_tracking.json)."""
+    return os.path.splitext(track_path)[0] + ".json"
+
+
+def save_run_metadata(track_path, metadata):
+    """Write the run metadata (fps, ROI, frame size, ...) next to the track file."""
+    with open(metadata_path(track_path), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+
+def load_run_metadata(track_path):
+    """
+    Load the run metadata of a track file, or None if it has none. Older results with a
+    shared sidecar are read too, as long as it was written for this track's format.
+    """
+    path = metadata_path(track_path)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    path = _legacy_metadata_path(track_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        metadata = json.load(f)
+    fmt = os.path.splitext(track_path)[1].lstrip(".")
+    if metadata.get("format", fmt) != fmt:
+        return None
+    return metadata
+
+
+def track_path_for(results_folder, video_name, fmt="csv"):
+    """Path of the track file of a video in the given format."""
+    return os.path.join(results_folder, f"{video_name}_tracking.{fmt}")
+
+
+class TrackWriter:
+    """
+    Buffered track writer. Rows are collected in a preallocated structured array and
+    written out a chunk at a time, either as CSV or as a binary .npy file of TRACK_DTYPE
+    records that can be memory-mapped when loaded.
+
+    The .npy data is streamed to a temporary file and only gets its header (which holds
+    the row count) when the writer is closed.
+    """
+
+    def __init__(self, path, fmt=None, chunk_size=4096):
+        """
+        Args:
+            path (str): Output file path.
+            fmt (str): "csv" or "npy" (default: taken from the file extension).
+            chunk_size (int): Number of rows buffered between writes.
+        """
+        self.path = path
+        self.fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+        if self.fmt not in TRACK_FORMATS:
+            raise ValueError(f"Unknown track format: {self.fmt}")
+        self._buffer = np.empty(chunk_size, dtype=TRACK_DTYPE)
+        self._count = 0
+        self.rows_written = 0
+
+        if self.fmt == "csv":
+            self._file = open(path, "w", newline="")
+            self._file.write(CSV_HEADER)
+        else:
+            self._file = open(path + ".part", "wb")
+
+    def write(self, frame, coordinate, in_center, observed=True, skipped=False):
+        """Buffer one row; coordinate is an (x, y) tuple or None."""
+        x, y = coordinate if coordinate else (-1, -1)
+        self._buffer[self._count] = (frame, x, y, in_center, observed and coordinate is not None,
+                                     skipped)
+        self._count += 1
+        if self._count == len(self._buffer):
+            self.flush()
+
+    def write_many(self, frames, x, y, in_center, observed=None, skipped=None):
+        """
+        Write whole arrays of rows at once (x/y of -1 where the mouse was not seen).
+        observed defaults to every row with a known position, skipped to none.
+        """
+        if observed is None:
+            observed = np.asarray(x) >= 0
+        if skipped is None:
+            skipped = np.zeros(len(frames), dtype=bool)
+        self.flush()
+        for start in range(0, len(frames), len(self._buffer)):
+            end = min(start + len(self._buffer), len(frames))
+            chunk = self._buffer[:end - start]
+            chunk["frame"] = frames[start:end]
+            chunk["x"] = x[start:end]
+            chunk["y"] = y[start:end]
+            chunk["in_center"] = in_center[start:end]
+            chunk["observed"] = observed[start:end]
+            chunk["skipped"] = skipped[start:end]
+            self._count = end - start
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows."""
+        if not self._count:
+            return
+        chunk = self._buffer[:self._count]
+        if self.fmt == "csv":
+            self._file.write(_format_csv_rows(chunk))
+        else:
+            self._file.write(chunk.tobytes())
+        self.rows_written += self._count
+        self._count = 0
+
+    def close(self):
+        """Flush the remaining rows and finalize the file."""
+        self.flush()
+        self._file.close()
+        if self.fmt == "npy":
+            _finalize_npy(self.path + ".part", self.path, self.rows_written)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _format_csv_rows(chunk):
+    """Format a chunk of track records as CSV lines (blank coordinates where missing)."""
+    lines = []
+    for frame, x, y, in_center, observed, skipped in chunk.tolist():
+        if x < 0:
+            lines.append(f"{frame},,,{bool(in_center)},{bool(observed)},{bool(skipped)}\n")
+        else:
+            lines.append(f"{frame},{x},{y},{bool(in_center)},{bool(observed)},{bool(skipped)}\n")
+    return "".join(lines)
+
+
+def _finalize_npy(part_path, path, rows):
+    """Prepend the .npy header to the raw records and move the file into place."""
+    with open(path, "wb") as out, open(part_path, "rb") as part:
+        np.lib.format.write_array_header_1_0(out, {
+            "descr": np.lib.format.dtype_to_descr(TRACK_DTYPE),
+            "fortran_order": False,
+            "shape": (rows,),
+        })
+        while True:
+            block = part.read(1 << 20)
+            if not block:
+                break
+            out.write(block)
+    os.remove(part_path)
+
+
+def load_track(path, mmap=True):
+    """
+    Load a track file (.npy or .csv) as a structured array of TRACK_DTYPE records.
+
+    Args:
+        path (str): Track file path.
+        mmap (bool): Memory-map .npy files instead of reading them into memory.
+    """
+    if path.endswith(".npy"):
+        track = np.load(path, mmap_mode="r" if mmap else None)
+        if track.dtype == TRACK_DTYPE:
+            return track
+        # Older binary tracks lack newer fields; copy them into the current layout.
+        upgraded = np.zeros(len(track), dtype=TRACK_DTYPE)
+        for name in track.dtype.names:
+            upgraded[name] = track[name]
+        if "observed" not in track.dtype.names:
+            upgraded["observed"] = upgraded["x"] >= 0
+        return upgraded
+
+    import pandas as pd
+    df = pd.read_csv(path)
+    track = np.empty(len(df), dtype=TRACK_DTYPE)
+    track["frame"] = df["frame"].to_numpy()
+    track["x"] = df["x"].fillna(-1).to_numpy()
+    track["y"] = df["y"].fillna(-1).to_numpy()
+    track["in_center"] = df["in_center"].astype(bool).to_numpy()
+    if "observed" in df:
+        track["observed"] = df["observed"].astype(bool).to_numpy()
+    else:
+        # Older tracks didn't record it; treat every known position as observed.
+        track["observed"] = track["x"] >= 0
+    track["skipped"] = df["skipped"].astype(bool).to_numpy() if "skipped" in df else False
+    return track
+
+
+def track_xy(track):
+    """Return float x and y arrays of a track, with NaN where the mouse was not seen."""
+    x = track["x"].astype(np.float64)
+    y = track["y"].astype(np.float64)
+    missing = (track["x"] < 0) | (track["y"] < 0)
+    x[missing] = np.nan
+    y[missing] = np.nan
+    return x, y
+
+
+def export_csv(track_path, csv_path=None):
+    """Export a binary track to CSV (default: same name with a .csv extension)."""
+    csv_path = csv_path or os.path.splitext(track_path)[0] + ".csv"
+    track = load_track(track_path)
+    with open(csv_path, "w", newline="") as f:
+        f.write(CSV_HEADER)
+        for start in range(0, len(track), 4096):
+            f.write(_format_csv_rows(track[start:start + 4096]))
+    return csv_path
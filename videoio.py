@@ -0,0 +1,383 @@
+# videoio.py
+import bisect
+import hashlib
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from roi_store import video_hash
+
+# Pluggable video readers. Every reader has the same small interface as cv2.VideoCapture
+# (read() -> (ret, frame), plus seek()/position/fps/frame_count), keeps performance
+# counters, and can return a grayscale and/or downscaled stream instead of full-size BGR.
+#
+#   "opencv"  cv2.VideoCapture on the FFmpeg backend with an explicit decode thread count.
+#   "pyav"    PyAV (optional dependency: pip install av) with threaded decode and
+#             frame-accurate seeking by timestamp.
+#   "auto"    whichever of the two measured fastest on this file (cached per video).
+
+READER_BACKENDS = ("opencv", "pyav")
+READER_CACHE_PATH = os.path.join("outputs", "cache", "readers.json")
+
+
+class VideoReader:
+    """Common part of the readers: output conversion, counters and seek policy."""
+
+    backend = None
+
+    def __init__(self, video_path, grayscale=False, scale=1.0, max_skip_frames=None):
+        """
+        Args:
+            video_path (str): Path to the video file.
+            grayscale (bool): Return single-channel luminance frames.
+            scale (float): Downscale factor applied to every frame (1.0 keeps full size).
+            max_skip_frames (int): Forward jumps up to this many frames decode through
+                instead of seeking (default: two seconds of video).
+        """
+        self.video_path = video_path
+        self.grayscale = grayscale
+        self.scale = scale
+        self.max_skip_frames = max_skip_frames
+        self.position = 0
+        self.counters = {"frames": 0, "skipped": 0, "seeks": 0, "decode_seconds": 0.0,
+                         "seek_seconds": 0.0}
+        self._gray = None
+
+    @property
+    def frame_size(self):
+        """(width, height) of the frames this reader returns."""
+        if self.scale == 1.0:
+            return self.width, self.height
+        return int(round(self.width * self.scale)), int(round(self.height * self.scale))
+
+    def _skip_limit(self):
+        if self.max_skip_frames is not None:
+            return self.max_skip_frames
+        return int(2 * (self.fps or 30))
+
+    def seek(self, index):
+        """Position the reader so the next read() returns frame index."""
+        if index == self.position:
+            return
+        started = time.perf_counter()
+        if self.position < index <= self.position + self._skip_limit() and self._can_skip_to(index):
+            # Closer than a seek: a seek lands on the keyframe before index and decodes
+            # forward from there anyway.
+            while self.position < index and self._skip():
+                self.counters["skipped"] += 1
+        else:
+            self._seek(index)
+            self.counters["seeks"] += 1
+        self.counters["seek_seconds"] += time.perf_counter() - started
+
+    def _can_skip_to(self, index):
+        return True
+
+    def read(self, out=None):
+        """Decode the next frame. Returns (ret, frame) like cv2.VideoCapture.read."""
+        started = time.perf_counter()
+        frame = self._read(out if not (self.grayscale or self.scale != 1.0) else None)
+        if frame is None:
+            return False, None
+        frame = self._convert(frame, out)
+        self.position += 1
+        self.counters["frames"] += 1
+        self.counters["decode_seconds"] += time.perf_counter() - started
+        return True, frame
+
+    def _convert(self, frame, out=None):
+        """Apply the grayscale/downscale options to a decoded BGR (or grey) frame."""
+        if self.grayscale and frame.ndim == 3:
+            if self.scale == 1.0:
+                return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=out)
+            if self._gray is None or self._gray.shape != frame.shape[:2]:
+                self._gray = np.empty(frame.shape[:2], dtype=np.uint8)
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        if self.scale != 1.0 and frame.shape[1::-1] != self.frame_size:
+            return cv2.resize(frame, self.frame_size, dst=out, interpolation=cv2.INTER_AREA)
+        return frame
+
+    def stats(self):
+        """Performance counters, with decode throughput in frames/sec."""
+        stats = dict(self.counters)
+        decode = stats["decode_seconds"]
+        stats["frames_per_sec"] = stats["frames"] / decode if decode > 0 else None
+        return stats
+
+    def release(self):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class OpenCVReader(VideoReader):
+    """cv2.VideoCapture on the FFmpeg backend with multithreaded (optionally hardware) decode."""
+
+    backend = "opencv"
+
+    def __init__(self, video_path, threads=0, hw_accel=False, **options):
+        """
+        Args:
+            video_path (str): Path to the video file.
+            threads (int): Decode threads (0 lets FFmpeg pick one per core).
+            hw_accel (bool): Ask FFmpeg for any available hardware decoder.
+            **options: grayscale, scale and max_skip_frames (see VideoReader).
+        """
+        super().__init__(video_path, **options)
+        params = [cv2.CAP_PROP_N_THREADS, int(threads)]
+        if hw_accel:
+            params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        self._cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, params)
+        if not self._cap.isOpened():
+            # Older builds reject the open parameters; other files need another backend.
+            self._cap = cv2.VideoCapture(video_path)
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) if self._cap.isOpened() else None
+        self.frame_count = max(int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def isOpened(self):
+        return self._cap is not None and self._cap.isOpened()
+
+    def _read(self, out=None):
+        ret, frame = self._cap.read(out)
+        return frame if ret else None
+
+    def _skip(self):
+        # grab() decodes without the colour conversion and copy of retrieve().
+        if not self._cap.grab():
+            return False
+        self.position += 1
+        return True
+
+    def _seek(self, index):
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        self.position = index
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class PyAVReader(VideoReader):
+    """
+    PyAV reader with threaded decode and frame-accurate seeking by presentation timestamp.
+
+    Keyframes seen while decoding are remembered, so a forward jump that doesn't cross a
+    keyframe always decodes through instead of seeking back to the same keyframe.
+    """
+
+    backend = "pyav"
+
+    def __init__(self, video_path, threads=0, **options):
+        """
+        Args:
+            video_path (str): Path to the video file.
+            threads (int): Decode threads (0 lets FFmpeg pick).
+            **options: grayscale, scale and max_skip_frames (see VideoReader).
+        """
+        super().__init__(video_path, **options)
+        try:
+            import av
+        except ImportError:
+            raise ImportError("The pyav reader needs PyAV: pip install av") from None
+        self._container = av.open(video_path)
+        self._stream = self._container.streams.video[0]
+        self._stream.thread_type = "AUTO"
+        self._stream.thread_count = int(threads)
+        rate = self._stream.average_rate or self._stream.guessed_rate
+        self.fps = float(rate) if rate else None
+        self.width = self._stream.codec_context.width
+        self.height = self._stream.codec_context.height
+        self._time_base = self._stream.time_base
+        self._start_pts = self._stream.start_time or 0
+        self.frame_count = self._stream.frames
+        if not self.frame_count and self._container.duration and self.fps:
+            self.frame_count = int(self._container.duration / av.time_base * self.fps)
+        self.keyframes = []
+        self._frames = self._container.decode(self._stream)
+
+    def isOpened(self):
+        return self._container is not None
+
+    def _index_of(self, frame):
+        if frame.pts is None:
+            return self.position
+        return int(round(float((frame.pts - self._start_pts) * self._time_base) * self.fps))
+
+    def _next_frame(self):
+        frame = next(self._frames, None)
+        if frame is None:
+            return None
+        index = self._index_of(frame)
+        if frame.key_frame:
+            at = bisect.bisect_left(self.keyframes, index)
+            if at == len(self.keyframes) or self.keyframes[at] != index:
+                self.keyframes.insert(at, index)
+        self.position = index
+        return frame
+
+    def _to_array(self, frame):
+        width, height = self.frame_size
+        fmt = "gray" if self.grayscale else "bgr24"
+        if (width, height) != (self.width, self.height):
+            frame = frame.reformat(width=width, height=height, format=fmt)
+        # The grey conversion just copies the luminance plane.
+        return frame.to_ndarray(format=fmt)
+
+    def read(self, out=None):
+        started = time.perf_counter()
+        frame = self._next_frame()
+        if frame is None:
+            return False, None
+        array = self._to_array(frame)
+        if out is not None and out.shape == array.shape:
+            out[...] = array
+            array = out
+        self.position += 1
+        self.counters["frames"] += 1
+        self.counters["decode_seconds"] += time.perf_counter() - started
+        return True, array
+
+    def _can_skip_to(self, index):
+        # A known keyframe between here and index makes a seek cheaper than decoding through.
+        at = bisect.bisect_right(self.keyframes, self.position)
+        return at == len(self.keyframes) or self.keyframes[at] > index
+
+    def _skip(self):
+        if self._next_frame() is None:
+            return False
+        self.position += 1
+        return True
+
+    def _seek(self, index):
+        target_pts = self._start_pts + int(round(index / self.fps / self._time_base))
+        # Lands on the keyframe at or before the target; decode forward to the exact frame.
+        self._container.seek(target_pts, stream=self._stream, backward=True, any_frame=False)
+        self._frames = self._container.decode(self._stream)
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                break
+            if self.position >= index:
+                # Put the frame at index back in front of the stream for the next read().
+                self._frames = _prepend(frame, self._frames)
+                break
+        self.position = index
+
+    def close(self):
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+def open_video(video_path, backend="opencv", **options):
+    """
+    Open a video with the given reader backend.
+
+    Args:
+        video_path (str): Path to the video file.
+        backend (str): "opencv", "pyav" or "auto" (the fastest measured on this file).
+        **options: Reader options (threads, grayscale, scale, max_skip_frames, and
+            hw_accel for OpenCV).
+
+    Returns:
+        reader (VideoReader): The opened reader; check isOpened() like a VideoCapture.
+    """
+    if backend in (None, "auto"):
+        backend = fastest_backend(video_path, **options)
+    if backend == "opencv":
+        return OpenCVReader(video_path, **options)
+    if backend == "pyav":
+        options.pop("hw_accel", None)
+        return PyAVReader(video_path, **options)
+    raise ValueError(f"Unknown video reader backend: {backend}")
+
+
+def benchmark_readers(video_path, backends=READER_BACKENDS, num_frames=300, num_seeks=10, **options):
+    """
+    Measure sequential decode and random seek speed of each available backend on a file.
+
+    Returns:
+        results (dict): backend -> {"frames_per_sec", "seek_ms"}; backends that can't
+            open the file (or aren't installed) are left out.
+    """
+    results = {}
+    for backend in backends:
+        try:
+            reader = open_video(video_path, backend, **options)
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Skipping {backend} reader: {e}")
+            continue
+        with reader:
+            if not reader.isOpened():
+                continue
+            for _ in range(num_frames):
+                if not reader.read()[0]:
+                    break
+            count = max(reader.frame_count, 1)
+            seek_started = time.perf_counter()
+            for index in np.linspace(count - 1, 0, num_seeks).astype(int):
+                reader.seek(int(index))
+                reader.read()
+            seek_ms = (time.perf_counter() - seek_started) / num_seeks * 1000
+            sequential = reader.stats()
+        results[backend] = {"frames_per_sec": sequential["frames_per_sec"], "seek_ms": seek_ms}
+    return results
+
+
+def fastest_backend(video_path, **options):
+    """
+    The backend that decodes this file fastest, measured once and cached per video content
+    and reader options in outputs/cache/readers.json.
+    """
+    key = hashlib.sha1(json.dumps({"video": video_hash(video_path), "options": options},
+                                  sort_keys=True).encode()).hexdigest()
+    cache = {}
+    if os.path.exists(READER_CACHE_PATH):
+        with open(READER_CACHE_PATH) as f:
+            cache = json.load(f)
+    if key in cache:
+        return cache[key]["backend"]
+
+    results = benchmark_readers(video_path, **options)
+    measured = {name: r for name, r in results.items() if r["frames_per_sec"]}
+    backend = max(measured, key=lambda name: measured[name]["frames_per_sec"]) if measured else "opencv"
+    cache[key] = {"backend": backend, "results": results}
+    os.makedirs(os.path.dirname(READER_CACHE_PATH), exist_ok=True)
+    tmp_path = READER_CACHE_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, READER_CACHE_PATH)
+    return backend
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare the video reader backends on a file.")
+    parser.add_argument("video", help="Video file to decode.")
+    parser.add_argument("--frames", type=int, default=300, help="Frames to decode sequentially.")
+    parser.add_argument("--threads", type=int, default=0, help="Decode threads (0 = automatic).")
+    parser.add_argument("--grayscale", action="store_true", help="Decode to grayscale.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Downscale factor.")
+    args = parser.parse_args()
+
+    results = benchmark_readers(args.video, num_frames=args.frames, threads=args.threads,
+                                grayscale=args.grayscale, scale=args.scale)
+    for backend, result in results.items():
+        print(f"{backend:<8} {result['frames_per_sec']:>9.1f} frames/sec  "
+              f"{result['seek_ms']:>8.1f} ms/seek")
@@ -0,0 +1,172 @@
+# zones.py
+import json
+
+import cv2
+import numpy as np
+
+# Zones are plain JSON-serialisable dicts so they can be saved with a run's metadata.
+# Coordinates are fractions of the arena width/height, so one definition fits any crop.
+#
+#   {"name": "center", "type": "center", "percent": 50}
+#   {"name": "nest", "type": "rect", "x0": 0.0, "y0": 0.0, "x1": 0.3, "y1": 0.3}
+#   {"name": "object", "type": "circle", "cx": 0.7, "cy": 0.5, "r": 0.1}
+#   {"name": "ramp", "type": "polygon", "points": [[0.1, 0.9], [0.4, 0.9], [0.1, 0.6]]}
+#
+# A circle's radius is a fraction of the shorter side of the arena.
+
+MAX_ZONES = 32
+
+
+def center_zone(percent=50, name="center"):
+    """Centered box whose sides are percent of the arena's width and height."""
+    return {"name": name, "type": "center", "percent": percent}
+
+
+def rect_zone(name, x0, y0, x1, y1):
+    return {"name": name, "type": "rect", "x0": x0, "y0": y0, "x1": x1, "y1": y1}
+
+
+def circle_zone(name, cx, cy, r):
+    return {"name": name, "type": "circle", "cx": cx, "cy": cy, "r": r}
+
+
+def polygon_zone(name, points):
+    return {"name": name, "type": "polygon", "points": [list(p) for p in points]}
+
+
+def corner_zones(size=0.2):
+    """Four square corner zones with sides of size (fraction of the arena)."""
+    return [
+        rect_zone("corner_top_left", 0.0, 0.0, size, size),
+        rect_zone("corner_top_right", 1.0 - size, 0.0, 1.0, size),
+        rect_zone("corner_bottom_left", 0.0, 1.0 - size, size, 1.0),
+        rect_zone("corner_bottom_right", 1.0 - size, 1.0 - size, 1.0, 1.0),
+    ]
+
+
+def wall_zones(width=0.1):
+    """Four bands of the given width (fraction of the arena) along the walls."""
+    return [
+        rect_zone("wall_top", 0.0, 0.0, 1.0, width),
+        rect_zone("wall_bottom", 0.0, 1.0 - width, 1.0, 1.0),
+        rect_zone("wall_left", 0.0, 0.0, width, 1.0),
+        rect_zone("wall_right", 1.0 - width, 0.0, 1.0, 1.0),
+    ]
+
+
+def load_zones(path):
+    """Load a list of zone definitions from a JSON file."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def center_box(width, height, percent=50):
+    """
+    Pixel corners of the center box: a centered rectangle whose sides are percent of the
+    frame's width and height. Both corners are inclusive.
+    """
+    box_w = int(width * percent / 100)
+    box_h = int(height * percent / 100)
+    top_left = ((width - box_w) // 2, (height - box_h) // 2)
+    bottom_right = (top_left[0] + box_w, top_left[1] + box_h)
+    return top_left, bottom_right
+
+
+def zone_outline(zone, width, height):
+    """Pixel outline of a zone as an (N, 2) int32 polygon (circles are approximated)."""
+    kind = zone["type"]
+    if kind == "center":
+        (x0, y0), (x1, y1) = center_box(width, height, zone["percent"])
+        return np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.int32)
+    if kind == "rect":
+        x0, x1 = int(round(zone["x0"] * width)), int(round(zone["x1"] * width)) - 1
+        y0, y1 = int(round(zone["y0"] * height)), int(round(zone["y1"] * height)) - 1
+        return np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.int32)
+    if kind == "circle":
+        center = (int(round(zone["cx"] * width)), int(round(zone["cy"] * height)))
+        radius = int(round(zone["r"] * min(width, height)))
+        return cv2.ellipse2Poly(center, (radius, radius), 0, 0, 360, 5).astype(np.int32)
+    if kind == "polygon":
+        points = np.asarray(zone["points"], dtype=np.float64) * (width, height)
+        return np.round(points).astype(np.int32)
+    raise ValueError(f"Unknown zone type: {kind}")
+
+
+class ZoneMap:
+    """
+    Zones rasterized once into a label image for an arena of a given size.
+
+    Bit i of each pixel is set when the pixel is inside zone i, so zones may overlap and
+    zone membership of a whole track is a single gather from the label image.
+    """
+
+    def __init__(self, width, height, zones):
+        """
+        Args:
+            width (int): Arena (cropped frame) width in pixels.
+            height (int): Arena height in pixels.
+            zones (list of dict): Zone definitions (at most 32).
+        """
+        if len(zones) > MAX_ZONES:
+            raise ValueError(f"At most {MAX_ZONES} zones are supported, got {len(zones)}.")
+        self.width = width
+        self.height = height
+        self.zones = list(zones)
+        self.names = [zone["name"] for zone in self.zones]
+        self.labels = np.zeros((height, width), dtype=np.uint32)
+
+        mask = np.empty((height, width), dtype=np.uint8)
+        for bit, zone in enumerate(self.zones):
+            mask[:] = 0
+            self._rasterize(zone, mask)
+            self.labels[mask > 0] |= np.uint32(1 << bit)
+
+    def _rasterize(self, zone, mask):
+        if zone["type"] == "circle":
+            center = (int(round(zone["cx"] * self.width)), int(round(zone["cy"] * self.height)))
+            radius = int(round(zone["r"] * min(self.width, self.height)))
+            cv2.circle(mask, center, radius, 255, -1)
+        elif zone["type"] in ("center", "rect"):
+            outline = zone_outline(zone, self.width, self.height)
+            cv2.rectangle(mask, tuple(int(v) for v in outline[0]), tuple(int(v) for v in outline[2]), 255, -1)
+        else:
+            cv2.fillPoly(mask, [zone_outline(zone, self.width, self.height)], 255)
+
+    def lookup(self, x, y):
+        """
+        Zone bitmask of every (x, y) position. Positions that are NaN, negative (unknown)
+        or outside the arena get 0.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            valid = (x >= 0) & (y >= 0) & (x < self.width) & (y < self.height)
+        xi = np.where(valid, x, 0).astype(np.intp)
+        yi = np.where(valid, y, 0).astype(np.intp)
+        return np.where(valid, self.labels[yi, xi], np.uint32(0))
+
+    def contains(self, name, x, y):
+        """Boolean membership of the positions in the named zone."""
+        bit = np.uint32(1 << self.names.index(name))
+        return (self.lookup(x, y) & bit) != 0
+
+    def membership(self, x, y):
+        """Dict mapping every zone name to the boolean membership of the positions."""
+        labels = self.lookup(x, y)
+        return {name: (labels & np.uint32(1 << bit)) != 0 for bit, name in enumerate(self.names)}
+
+    def contains_point(self, name, coordinate):
+        """Whether a single (x, y) coordinate (or None) is inside the named zone."""
+        if not coordinate:
+            return False
+        x, y = coordinate
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        return bool(self.labels[int(y), int(x)] & (1 << self.names.index(name)))
+
+    def draw(self, frame, color=(0, 255, 255), thickness=2):
+        """Draw every zone's outline onto the frame."""
+        for zone in self.zones:
+            outline = zone_outline(zone, self.width, self.height)
+            cv2.polylines(frame, [outline], True, color, thickness)
+        return frame